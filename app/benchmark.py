@@ -0,0 +1,249 @@
+import argparse
+import atexit
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import MinMaxScaler
+
+from models.artifact import load_model
+from models.lstm import LSTM
+from models.price_store import PriceStore, build_store, get_store
+from models.stock import CSV_DIR, get_stock_data, read_csv_prices
+from models.windowing import make_windows, train_test_split
+
+# Micro benchmarks of the LSTM core and data path, and end-to-end endpoint timings
+# through TestClient, on the bundled stock_data_csv tickers. --save writes the
+# results as a JSON baseline; --compare times the same benchmarks against one and
+# exits with status 1 when any median got slower by more than --threshold.
+# Run build_price_store.py first, baselines are recorded with a fresh price store.
+# Baselines are only comparable on the machine they were recorded on.
+BASELINE_DIR = "benchmarks"
+# Timed through get_stock_data, which reads the price store only while it is built
+# and fresh. When that differs from the baseline's run these aren't compared
+STORE_DEPENDENT = ("data.get_stock_data", "api.predict")
+
+parser = argparse.ArgumentParser(description="Time the LSTM core, data loading and API endpoints")
+parser.add_argument("names", nargs="*", help="Benchmarks to run (substring match), all of them by default")
+parser.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+parser.add_argument("--ticker", default="AHPC")
+parser.add_argument("--sector", default="finance")
+parser.add_argument("--rounds", type=int, default=5, help="Timed rounds per benchmark, the median is reported")
+parser.add_argument("--min-time", type=float, default=0.2, help="Seconds each round runs for at least")
+parser.add_argument("--save", help=f"Write the results to this baseline file, e.g. {BASELINE_DIR}/baseline.json")
+parser.add_argument("--compare", help="Baseline file to compare the results with")
+parser.add_argument("--threshold", type=float, default=0.25, help="Slowdown that counts as a regression, 0.25 is 25%%")
+args = parser.parse_args()
+
+
+def data_fixture():
+    df = get_stock_data(args.ticker, tail=1000)
+    scaled = MinMaxScaler(feature_range=(-1, 1)).fit_transform(df['close'].values.reshape(-1, 1))
+    X, y = make_windows(scaled, 6)
+    return scaled, train_test_split(X, y)
+
+
+def bench_forward_single_window():
+    model = load_model("SavedModel", args.ticker)
+    _, (_, _, X_test, _) = data_fixture()
+    window = X_test[0]
+    return lambda: model.forward(window)
+
+
+def bench_inference_test_split():
+    model = load_model("SavedModel", args.ticker)
+    _, (_, _, X_test, _) = data_fixture()
+    return lambda: model.forward_batch(X_test)
+
+
+def bench_train_epoch(batch_size):
+    def setup():
+        _, (X_train, y_train, _, _) = data_fixture()
+        model = LSTM(input_size=1, hidden_size=30, output_size=1, learning_rate=0.0014)
+        return lambda: model.train(X_train, y_train, epochs=1, batch_size=batch_size, plot=False)
+    return setup
+
+
+def bench_make_windows():
+    scaled, _ = data_fixture()
+    return lambda: train_test_split(*make_windows(scaled, 6))
+
+
+def bench_get_stock_data():
+    return lambda: get_stock_data(args.ticker, tail=1000)
+
+
+def bench_price_store_read():
+    # A store of its own, so the timing doesn't depend on ./price_store being built
+    store_dir = tempfile.mkdtemp()
+    atexit.register(shutil.rmtree, store_dir, ignore_errors=True)
+    build_store(store_dir=store_dir)
+    store = PriceStore(store_dir)
+    return lambda: store.read(args.ticker, tail=1000)
+
+
+def bench_csv_prices():
+    return lambda: read_csv_prices(os.path.join(CSV_DIR, f"{args.ticker}.csv"), tail=1000)
+
+
+def price_store_serves(ticker):
+    """Whether get_stock_data reads the ticker from ./price_store rather than its CSV"""
+    store = get_store()
+    return store is not None and ticker in store and store.is_fresh(ticker, os.path.join(CSV_DIR, f"{ticker}.csv"))
+
+
+def bench_read_csv():
+    return lambda: pd.read_csv(f"./stock_data_csv/{args.ticker}.csv")
+
+
+_client = None
+
+
+def api_client():
+    """TestClient on the app, imported only when an endpoint benchmark runs"""
+    global _client, main
+    if _client is None:
+        # Uncached timings have to miss the disk tier as well
+        os.environ.pop("RESULT_CACHE_DIR", None)
+        # main binds its engine at import, point it away from the committed auth.db
+        db_dir = tempfile.mkdtemp()
+        atexit.register(shutil.rmtree, db_dir, ignore_errors=True)
+        os.environ["DATABASE_URL"] = f"sqlite:///{db_dir}/benchmark.db"
+        import main
+        from fastapi.testclient import TestClient
+        _client = TestClient(main.app)
+        _client.__enter__()
+    return _client
+
+
+def bench_endpoint(method, path, body=None, cached=True):
+    def setup():
+        client = api_client()
+
+        def call():
+            if not cached:
+                main.result_cache.clear()
+            response = client.request(method, path, json=body)
+            if response.status_code != 200:
+                raise RuntimeError(f"{method} {path} returned {response.status_code}: {response.text[:200]}")
+        return call
+    return setup
+
+
+BENCHMARKS = {
+    "lstm.forward_single_window": bench_forward_single_window,
+    "lstm.inference_test_split": bench_inference_test_split,
+    **{f"lstm.train_epoch_batch{b}": bench_train_epoch(b) for b in (15, 30, 60)},
+    "data.make_windows": bench_make_windows,
+    "data.get_stock_data": bench_get_stock_data,
+    "data.price_store_read": bench_price_store_read,
+    "data.csv_prices": bench_csv_prices,
+    "data.read_csv": bench_read_csv,
+    "api.predict": bench_endpoint("POST", "/predict", {"ticker": args.ticker}, cached=False),
+    "api.predict_cached": bench_endpoint("POST", "/predict", {"ticker": args.ticker}),
+    "api.sectorwise_prediction": bench_endpoint("POST", "/get_sectorwise_prediction", {"sector": args.sector}, cached=False),
+    "api.eda": bench_endpoint("GET", f"/eda/{args.ticker}"),
+}
+
+
+def measure(fn):
+    """Median and best seconds per call over the rounds, each round repeating fn
+    enough times to run for at least min_time"""
+    fn()  # Warm up caches and lazy imports
+    start = time.perf_counter()
+    fn()
+    once = time.perf_counter() - start
+    number = max(1, int(args.min_time / once)) if once > 0 else 1000
+
+    per_call = []
+    for _ in range(args.rounds):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number)
+    return {"median": statistics.median(per_call), "min": min(per_call), "rounds": args.rounds, "number": number}
+
+
+def machine():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "cpus": os.cpu_count(),
+    }
+
+
+def format_seconds(seconds):
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.2f} {unit}"
+    return f"{seconds / 1e-9:.0f} ns"
+
+
+if args.list:
+    print("\n".join(BENCHMARKS))
+    sys.exit(0)
+
+selected = [name for name in BENCHMARKS if not args.names or any(part in name for part in args.names)]
+results = {}
+for name in selected:
+    # Training and the endpoints print per call
+    with contextlib.redirect_stdout(io.StringIO()):
+        results[name] = measure(BENCHMARKS[name]())
+    print(f"{name:<32} {format_seconds(results[name]['median']):>10} median  {format_seconds(results[name]['min']):>10} min")
+
+if _client is not None:
+    _client.__exit__(None, None, None)
+
+if args.save:
+    os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+    with open(args.save, "w") as f:
+        json.dump({"created_at": datetime.now().isoformat(timespec="seconds"), "machine": machine(),
+                   "ticker": args.ticker, "sector": args.sector, "price_store": price_store_serves(args.ticker),
+                   "results": results}, f, indent=1)
+    print(f"\nBaseline written to {args.save}")
+
+if args.compare:
+    with open(args.compare) as f:
+        baseline = json.load(f)
+    if baseline["machine"] != machine():
+        print(f"\nWarning: the baseline was recorded on {baseline['machine']}")
+
+    # Baselines recorded before this was stored were taken with a fresh store
+    served_before, served_now = baseline.get("price_store", True), price_store_serves(args.ticker)
+    store_changed = served_before != served_now
+    if store_changed:
+        source = {True: "the price store", False: "its CSV"}
+        print(f"\nWarning: get_stock_data read {args.ticker} from {source[served_before]} for the baseline and from "
+              f"{source[served_now]} now (see build_price_store.py), not comparing {', '.join(STORE_DEPENDENT)}")
+
+    regressions = []
+    print(f"\n{'benchmark':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for name, result in results.items():
+        before = baseline["results"].get(name)
+        if before is None:
+            print(f"{name:<32} {'-':>10} {format_seconds(result['median']):>10}      new")
+            continue
+        if store_changed and name in STORE_DEPENDENT:
+            print(f"{name:<32} {format_seconds(before['median']):>10} {format_seconds(result['median']):>10}  skipped")
+            continue
+        change = result["median"] / before["median"] - 1
+        flag = "  REGRESSION" if change > args.threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<32} {format_seconds(before['median']):>10} {format_seconds(result['median']):>10} {change:>+8.1%}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}")
+        sys.exit(1)
+    print(f"\nNo benchmark is slower than the baseline by more than {args.threshold:.0%}")
@@ -0,0 +1,18 @@
+import argparse
+from models.eda import EDA_DIR, update_eda
+
+# Regenerates the EDA served by /eda/{ticker} for the tickers whose CSV changed since
+# the previous run: a JSON document of the tables plus one PNG per plot, replacing
+# the pickles EDA/IterativeStockEDA.ipynb writes. Run it after updating the CSVs.
+parser = argparse.ArgumentParser(description="Build the per-ticker EDA documents and plots")
+parser.add_argument("tickers", nargs="*", help="Tickers to update, all of them by default")
+parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the number of cores")
+parser.add_argument("--force", action="store_true", help="Regenerate tickers whose CSV hasn't changed")
+args = parser.parse_args()
+
+report = update_eda(tickers=args.tickers, workers=args.workers, force=args.force)
+
+if not report:
+    print(f"{EDA_DIR} is up to date")
+for ticker, change in sorted(report.items()):
+    print(f"{ticker}: {change}")
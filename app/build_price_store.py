@@ -0,0 +1,9 @@
+from models.price_store import build_store, STORE_DIR
+
+# One-time conversion of stock_data_csv/ into the memory-mapped price store.
+# Rerun it after the CSVs are updated; until then get_stock_data falls back
+# to reading the changed CSVs directly.
+tickers = build_store()
+
+rows = sum(entry["length"] for entry in tickers.values())
+print(f"Price store written to {STORE_DIR}: {len(tickers)} tickers, {rows} rows")
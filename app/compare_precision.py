@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import tempfile
+import time
+import numpy as np
+from models.artifact import has_artifact, load_model
+from models.bulk_train import train_one
+from models.stacked import evaluate_test_windows
+from models.stock import get_stock_data
+
+# Accuracy of float32 models against float64 on the saved tickers. By default the
+# saved float64 weights are cast to float32 and both are scored on the test windows
+# /predict uses; with --train both precisions are also trained from the same seed.
+save_dir = "SavedModel"
+
+parser = argparse.ArgumentParser(description="Compare float32 and float64 LSTM accuracy per ticker")
+parser.add_argument("tickers", nargs="*", help="Tickers to compare, every ticker with a saved model by default")
+parser.add_argument("--train", action="store_true", help="Also train a model per precision and compare those")
+parser.add_argument("--epochs", type=int, default=15)
+parser.add_argument("--output", help="Write the per-ticker rows and summary to this JSON file")
+args = parser.parse_args()
+
+tickers = args.tickers or sorted(
+    os.path.splitext(csv)[0] for csv in os.listdir("./stock_data_csv")
+    if has_artifact(save_dir, os.path.splitext(csv)[0])
+)
+frames = {ticker: get_stock_data(ticker, tail=1000) for ticker in tickers}
+
+
+def score(models, repeat=3):
+    # Best of a few runs so neither precision pays for warming up
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        results = evaluate_test_windows(models, frames)
+        timings.append(time.perf_counter() - start)
+    return results, min(timings)
+
+
+def compare(models64, models32):
+    results64, seconds64 = score(models64)
+    results32, seconds32 = score(models32)
+    rows = []
+    for ticker in tickers:
+        r64, r32 = results64[ticker], results32[ticker]
+        mse64, mse32 = float(r64["metrics"]["MSE"]), float(r32["metrics"]["MSE"])
+        rows.append({
+            "ticker": ticker,
+            "mse_float64": mse64,
+            "mse_float32": mse32,
+            "mse_change_pct": 100 * (mse32 - mse64) / mse64 if mse64 else 0.0,
+            "max_abs_prediction_diff": float(np.max(np.abs(np.subtract(r32["predictions"], r64["predictions"])))),
+        })
+    return rows, {"float64": seconds64, "float32": seconds32}
+
+
+def print_rows(title, rows, seconds):
+    print(f"\n{title}")
+    print(f"{'ticker':<10} {'MSE float64':>14} {'MSE float32':>14} {'change %':>10} {'max |diff|':>12}")
+    for row in rows:
+        print(f"{row['ticker']:<10} {row['mse_float64']:>14.4f} {row['mse_float32']:>14.4f} "
+              f"{row['mse_change_pct']:>10.4f} {row['max_abs_prediction_diff']:>12.6f}")
+    changes = np.abs([row["mse_change_pct"] for row in rows])
+    print(f"|MSE change| median {np.median(changes):.4f}%, max {np.max(changes):.4f}%; "
+          f"scoring took {seconds['float64']:.3f}s in float64, {seconds['float32']:.3f}s in float32")
+    return {"median_abs_mse_change_pct": float(np.median(changes)), "max_abs_mse_change_pct": float(np.max(changes)), "seconds": seconds}
+
+
+report = {}
+
+saved = {ticker: load_model(save_dir, ticker, mmap=False) for ticker in tickers}
+rows, seconds = compare(saved, {ticker: model.astype("float32") for ticker, model in saved.items()})
+report["inference"] = {"rows": rows, "summary": print_rows("Saved weights cast to float32", rows, seconds)}
+
+model = saved[tickers[0]]
+model_bytes = {dtype: sum(value.nbytes for value in model.astype(dtype).params.values()) for dtype in ("float64", "float32")}
+print(f"Weights per model: {model_bytes['float64']} bytes in float64, {model_bytes['float32']} in float32")
+report["weight_bytes_per_model"] = model_bytes
+
+if args.train:
+    trained = {}
+    with tempfile.TemporaryDirectory() as model_dir:
+        for dtype in ("float64", "float32"):
+            for ticker in tickers:
+                train_one(ticker, frames[ticker], os.path.join(model_dir, dtype), epochs=args.epochs, dtype=dtype)
+            trained[dtype] = {ticker: load_model(os.path.join(model_dir, dtype), ticker, mmap=False) for ticker in tickers}
+    rows, seconds = compare(trained["float64"], trained["float32"])
+    report["training"] = {"epochs": args.epochs, "rows": rows, "summary": print_rows(f"Trained for {args.epochs} epochs in each precision", rows, seconds)}
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nReport written to {args.output}")
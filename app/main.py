@@ -1,26 +1,46 @@
-from fastapi import FastAPI, HTTPException , Depends , status
+from fastapi import FastAPI, HTTPException , Depends , status , Request , Response , Query
 from pydantic import BaseModel
 import numpy as np
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 from models.lstm import LSTM
+from models.manifest import TickerManifest
+from models.registry import ModelRegistry
+from models.artifact import load_convergence_plot
+from models.db_writer import BatchWriter
+from models.result_cache import ResultCache, TTLCache, file_signature
+from models.forecast import forecast
+from models.stacked import evaluate_test_windows
+from models.sector_merge import merged_path, read_sector_prices, sector_key
+from models.pipeline import train_and_evaluate
+from models.jobs import JobManager, QueueFullError
+from models.instrumentation import PHASE_SECONDS, REQUEST_SECONDS, REQUESTS, TimingMiddleware, metric_lines, span
+from models.eda import PLOTS, convert_legacy, document_path, plot_path
+from models.history import BINARY_MEDIA_TYPE, compress, parse_fields, price_series, to_binary, to_json
+from models.sweep import best_trial, expand_space, public_trials, run_sweep
 from models.stock import get_stock_data
 from models.utils import mse, rmse, mape
+from models.windowing import make_windows, train_test_split
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 import os 
-import joblib
+import asyncio
+import json
 import io
 import base64
-from sqlalchemy import create_engine, Column, Integer, String , Float , ForeignKey , DateTime
+import threading
+import time
+import uuid
+from sqlalchemy import create_engine, Column, Integer, String , Float , ForeignKey , DateTime , Index , event , func , inspect , text , tuple_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session , relationship
 from passlib.context import CryptContext
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
+from email.utils import formatdate, parsedate_to_datetime
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from jose import JWTError, jwt
-from typing import List
-from sqlalchemy.orm import joinedload
+from typing import Dict, List, Optional
+from functools import partial
 
 
 # Constants
@@ -28,9 +48,59 @@ SECRET_KEY = "mysecretkey"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_HOURS = 24
 
+# Model cache: how many deserialized models to keep, which ones to load at
+# startup (comma separated names) and how many of the most requested ones
+# from previous runs to load as well
+MODEL_CACHE_SIZE = int(os.environ.get("MODEL_CACHE_SIZE", 32))
+MODEL_PRELOAD = [name for name in os.environ.get("MODEL_PRELOAD", "").split(",") if name]
+MODEL_PRELOAD_TOP = int(os.environ.get("MODEL_PRELOAD_TOP", 0))
+MODEL_POPULARITY_FILE = os.path.join("SavedModel", ".popularity.json")
+
+# Cached /predict and /get_sectorwise_prediction results, RESULT_CACHE_DIR
+# also keeps them on disk across restarts
+RESULT_CACHE_SIZE = int(os.environ.get("RESULT_CACHE_SIZE", 256))
+RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR") or None
+
+# Longest forecast /forecast will run, each step feeds on the previous prediction
+MAX_FORECAST_HORIZON = int(os.environ.get("MAX_FORECAST_HORIZON", 60))
+
+# How long browsers may reuse an EDA plot before revalidating it
+EDA_PLOT_MAX_AGE = int(os.environ.get("EDA_PLOT_MAX_AGE", 3600))
+
+# Background training jobs: concurrent worker processes and how many more
+# jobs may wait for one before submissions are rejected
+TRAINING_WORKERS = int(os.environ.get("TRAINING_WORKERS", 2))
+TRAINING_QUEUE_DEPTH = int(os.environ.get("TRAINING_QUEUE_DEPTH", 16))
+# Seconds between progress polls of a /training_jobs/{job_id}/events stream
+TRAINING_EVENTS_INTERVAL = float(os.environ.get("TRAINING_EVENTS_INTERVAL", 0.5))
+
+# Hyperparameter sweeps: worker processes per sweep, most trials a sweep may
+# expand to and how many sweeps may run at once
+SWEEP_WORKERS = int(os.environ.get("SWEEP_WORKERS", 2))
+MAX_SWEEP_TRIALS = int(os.environ.get("MAX_SWEEP_TRIALS", 64))
+MAX_CONCURRENT_SWEEPS = int(os.environ.get("MAX_CONCURRENT_SWEEPS", 1))
+
+# Seconds a token keeps resolving to its user without decoding it or querying users
+AUTH_CACHE_TTL = float(os.environ.get("AUTH_CACHE_TTL", 60))
+AUTH_CACHE_SIZE = int(os.environ.get("AUTH_CACHE_SIZE", 1024))
+
 # Database setup
-SQLALCHEMY_DATABASE_URL = "sqlite:///./auth.db"
-engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False})
+# Overridable so tests can run against a scratch database
+SQLALCHEMY_DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///./auth.db")
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+engine = create_engine(SQLALCHEMY_DATABASE_URL, connect_args={"check_same_thread": False}, pool_size=DB_POOL_SIZE)
+
+@event.listens_for(engine, "connect")
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # WAL lets reads run while a write commits, and with synchronous=NORMAL a commit
+    # doesn't fsync; busy_timeout makes a writer wait for the lock instead of failing
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
@@ -48,8 +118,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Server-Timing"],
 )
 
+# Per request phase timings, as a Server-Timing header and in /metrics
+app.add_middleware(TimingMiddleware)
+
 # Database model
 class User(Base):
     __tablename__ = "users"
@@ -65,19 +139,51 @@ class PredictionResult(Base):
     batch_size = Column(Integer)
     learning_rate = Column(Float)
     epochs = Column(Integer)
+    # Fewer than epochs when training stopped early or a sweep pruned the trial
+    epochs_run = Column(Integer, nullable=True)
     window_size = Column(Integer)
     mse = Column(Float)
     rmse = Column(Float)
     mape = Column(Float)
     prediction_at = Column(String)
+    # prediction_at as a timestamp, what history is sorted, filtered and paged on
+    created_at = Column(DateTime, nullable=True)
     user_id = Column(Integer, ForeignKey("users.id")) 
+    # Set on the trials of a hyperparameter sweep
+    sweep_id = Column(String, index=True, nullable=True)
     user = relationship("User", back_populates="prediction_results")
+    __table_args__ = (Index("ix_prediction_results_user_created", "user_id", "created_at"),)
     
 # Update the User class to link with predictions
 User.prediction_results = relationship("PredictionResult", back_populates="user")
 
 Base.metadata.create_all(bind=engine)
 
+def add_missing_columns(table):
+    # create_all only creates missing tables, an existing auth.db also needs
+    # the columns and indexes added to the model since it was created
+    existing = {column["name"] for column in inspect(engine).get_columns(table.name)}
+    with engine.begin() as connection:
+        for column in table.columns:
+            if column.name not in existing:
+                column_type = column.type.compile(dialect=engine.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+    for index in table.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+add_missing_columns(PredictionResult.__table__)
+
+def backfill_created_at():
+    # Rows stored before created_at existed only have prediction_at, "YYYY-MM-DD HH:MM",
+    # written here in the format SQLAlchemy stores DateTime in on SQLite
+    with engine.begin() as connection:
+        connection.execute(text(
+            "UPDATE prediction_results SET created_at = prediction_at || :seconds "
+            "WHERE created_at IS NULL AND length(prediction_at) = 16"
+        ), {"seconds": ":00.000000"})
+
+backfill_created_at()
+
 # Pydantic models
 class UserCreate(BaseModel):
     username: str
@@ -93,12 +199,15 @@ class PredictionResultResponseModel(BaseModel):
     batch_size: int
     learning_rate: float
     epochs: int
+    epochs_run: Optional[int] = None
     window_size: int
     mse: float
     rmse: float
     mape: float
     prediction_at : str
+    created_at: Optional[datetime] = None
     user_id: int
+    sweep_id: Optional[str] = None
 
 # Dependency
 def get_db():
@@ -124,6 +233,28 @@ def create_access_token(data: dict, expires_delta: timedelta):
 def get_user(db: Session, username: str):
     return db.query(User).filter(User.username == username).first()
 
+# Token -> User, detached from the session that loaded it
+user_cache = TTLCache(ttl=AUTH_CACHE_TTL, capacity=AUTH_CACHE_SIZE)
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = user_cache.get(token)
+    if user is not None:
+        return user
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    username: str = payload.get("sub")
+    if username is None:
+        raise HTTPException(status_code=401, detail="Invalid token")
+    user = get_user(db, username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    db.expunge(user)
+    # Never past the token's own expiry
+    user_cache.put(token, user, ttl=payload["exp"] - time.time() if "exp" in payload else None)
+    return user
+
 # Routes
 @app.post("/signup", response_model=Token)
 def signup(user: UserCreate, db: Session = Depends(get_db)):
@@ -150,28 +281,61 @@ def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depend
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.get("/protected")
-def protected_route(token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    except JWTError:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+def protected_route(user: User = Depends(get_current_user)):
     return {"message": "Protected route accessed!"}
 
-scaler = MinMaxScaler(feature_range=(-1, 1))
+
+# Ticker/sector listing, also used to validate tickers before any work is done
+ticker_manifest = TickerManifest()
+
+@app.on_event("startup")
+def build_ticker_manifest():
+    ticker_manifest.refresh(force=True)
+
+# Deserialized models shared by the prediction endpoints
+model_registry = ModelRegistry(capacity=MODEL_CACHE_SIZE)
+result_cache = ResultCache(capacity=RESULT_CACHE_SIZE, disk_dir=RESULT_CACHE_DIR)
+
+@app.on_event("startup")
+def preload_models():
+    popular = model_registry.load_popularity(MODEL_POPULARITY_FILE)[:MODEL_PRELOAD_TOP]
+    names = list(dict.fromkeys(MODEL_PRELOAD + popular))
+    if names:
+        print(f"Preloaded models: {model_registry.preload(names)}")
+
+@app.on_event("shutdown")
+def save_model_popularity():
+    model_registry.save_popularity(MODEL_POPULARITY_FILE)
+
+def validate_ticker(ticker: str):
+    if not ticker_manifest.has_ticker(ticker):
+        raise HTTPException(status_code=404, detail=f"Unknown ticker {ticker}")
+
+def validate_sector(sector: str):
+    """The manifest's name of the sector, however the client cased it"""
+    name = ticker_manifest.resolve_sector(sector)
+    if name is None:
+        raise HTTPException(status_code=404, detail=f"Unknown sector {sector}")
+    return name
+
+def manifest_response(request: Request, content):
+    # Clients revalidate with If-None-Match and get a 304 while the manifest is unchanged
+    headers = {"ETag": ticker_manifest.etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == ticker_manifest.etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(content=content, headers=headers)
 
 class StockPredictionRequest(BaseModel):
     ticker: str
     window_size: int = 6  # Default window size
     batch_size : int = 15
+    include_convergence_plot: bool = True
     
 class StockPredictionResponse(BaseModel):
     predictions: list
     actual: list
     metrics: dict
-    convergence_plot: str = None  # Base64 encoded plot
+    convergence_plot: Optional[str] = None  # Base64 encoded plot
     
 class SectorWisePredictionResponse(BaseModel):
     predictions: list
@@ -181,303 +345,751 @@ class SectorWisePredictionResponse(BaseModel):
 class SectorWisePredictionRequest(BaseModel):
     sector: str
 
+class BulkPredictionRequest(BaseModel):
+    # Either a list of tickers or a sector from the ticker manifest
+    tickers: Optional[List[str]] = None
+    sector: Optional[str] = None
+
+class ForecastRequest(BaseModel):
+    tickers: List[str]
+    horizon: int = 5  # Trading days to forecast
+
 class NormalLstmRequestModel(BaseModel):
     ticker: str
     window_size: int = 6
     learning_rate : float = 0.0014 
     epochs : int = 15
     batch_size : int = 15
+    # Fine-tune the ticker's saved model on its new rows instead of training from scratch
+    incremental : bool = False
+    # Hold out the last validation_split of the training windows and stop once their loss
+    # hasn't improved by min_delta for patience epochs, keeping the best epoch's weights
+    early_stopping : bool = False
+    patience : int = 3
+    min_delta : float = 0.0
+    validation_split : float = 0.1
     
+class SweepRequest(BaseModel):
+    ticker: str
+    # Values to try per NormalLstmRequestModel hyperparameter, the others keep their default
+    space: Dict[str, List[float]]
+    mode: str = "grid"  # grid or random
+    trials: int = 20  # Random mode samples this many combinations
+    seed: int = 0
+    eta: int = 3  # Only the best 1/eta of the trials survive each checkpoint
+    min_epochs: int = 1  # First checkpoint
+
 class NormalLstmResponseModel(BaseModel):
     predictions: list
     actual: list
     metrics: dict
+    training: Optional[dict] = None
     
-# Dependency to get the current user
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+def early_stopping_options(request: NormalLstmRequestModel):
+    if not 0 < request.validation_split < 1 or request.patience < 1:
+        raise HTTPException(status_code=400, detail="validation_split must be between 0 and 1 and patience at least 1")
+    return {
+        "early_stopping": request.early_stopping,
+        "patience": request.patience,
+        "min_delta": request.min_delta,
+        "validation_split": request.validation_split,
+    }
+
+# PredictionResult rows are committed in batches by a background thread
+prediction_writer = BatchWriter(SessionLocal)
+
+@app.on_event("shutdown")
+def flush_prediction_results():
+    prediction_writer.close()
+    # Closing the last connection checkpoints the WAL back into auth.db
+    engine.dispose()
+
+def store_prediction_result(request: NormalLstmRequestModel, metrics: dict, user_id: int, sweep_id: str = None,
+                            epochs_run: int = None):
+    now = datetime.now()
+    prediction_result = PredictionResult(
+        ticker=request.ticker,
+        batch_size=request.batch_size,
+        learning_rate=request.learning_rate,
+        epochs=request.epochs,
+        epochs_run=epochs_run,
+        window_size=request.window_size,
+        mse=metrics["MSE"],
+        rmse=metrics["RMSE"],
+        mape=metrics["MAPE"],
+        prediction_at = now.strftime("%Y-%m-%d %H:%M"),
+        created_at=now,
+        user_id=user_id,
+        sweep_id=sweep_id
+    )
+    prediction_writer.add(prediction_result)
+    return prediction_result
     
 @app.post("/predict_with_normal_lstm", response_model=NormalLstmResponseModel)
-def predict_with_normal_lstm(request: NormalLstmRequestModel, db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
+def predict_with_normal_lstm(request: NormalLstmRequestModel, user: User = Depends(get_current_user)):
+    validate_ticker(request.ticker)
+    options = early_stopping_options(request)
     try:
-        print(f"Received token: {token}")
-        # Decode the token to get the current user's username (sub in token)
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+        result = train_and_evaluate(
+            request.ticker,
+            window_size=request.window_size,
+            learning_rate=request.learning_rate,
+            epochs=request.epochs,
+            batch_size=request.batch_size,
+            incremental=request.incremental,
+            **options,
+        )
+        
+        # Store the prediction result in the database
+        with span("store"):
+            store_prediction_result(request, result["metrics"], user.id, epochs_run=result["training"]["epochs_run"])
+        
+        return result
+        
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
+training_jobs = JobManager(max_workers=TRAINING_WORKERS, max_queued=TRAINING_QUEUE_DEPTH)
 
-        # Fetch the user from the database
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Initialize model 
-        model = LSTM(input_size=1, hidden_size=30, output_size=1, learning_rate=request.learning_rate)
-        df = get_stock_data(request.ticker)
+@app.on_event("shutdown")
+def stop_training_jobs():
+    training_jobs.shutdown()
 
-        if(len(df)>1000):
-            df = df.iloc[-1000::1,:]
+def store_job_result(request, job, user_id, result):
+    store_prediction_result(request, result["metrics"], user_id, epochs_run=result["training"]["epochs_run"])
 
-        prices = df['close'].values.reshape(-1, 1)
-        
-        # Normalize
-        scaled = scaler.fit_transform(prices)
-        
-        # Create sequences
-        X, y = [], []
-        window = request.window_size
-        for i in range(window, len(scaled)):
-            X.append(scaled[i-window:i])
-            y.append(scaled[i])
-        
-        X, y = np.array(X), np.array(y)
-        split = int(0.8 * len(X))
-        X_train, y_train = X[:split], y[:split]
-        X_test, y_test = X[split:], y[split:]
-        
-        # Train model
-        model.train(X_train, y_train, epochs=request.epochs, batch_size=request.batch_size)
-        
-        # Test
-        predictions = []
-        for seq in X_test:
-            y_pred, _ = model.forward(seq)
-            predictions.append(y_pred[0][0])
-            
-        
-        # Inverse transform
-        predictions = scaler.inverse_transform(np.array(predictions).reshape(-1, 1))
-        actual = scaler.inverse_transform(y_test.reshape(-1, 1))
-        
-        # Calculate metrics
-        mse_val = mse(actual, predictions)
-        rmse_val = rmse(actual, predictions)
-        mape_val = mape(actual, predictions)
-        
-        # Store the prediction result in the database
-        prediction_result = PredictionResult(
-            ticker=request.ticker,
-            batch_size=request.batch_size,
+def get_training_job(job_id: str, user: User):
+    job = training_jobs.get(job_id)
+    if job is None or user.id not in job["subscribers"]:
+        raise HTTPException(status_code=404, detail="Training job not found")
+    return job
+
+@app.post("/training_jobs", status_code=202)
+def submit_training_job(request: NormalLstmRequestModel, user: User = Depends(get_current_user)):
+    """Queues the same training run as /predict_with_normal_lstm and returns its job id at once.
+    Identical requests that are still queued or running share one job"""
+    validate_ticker(request.ticker)
+    options = early_stopping_options(request)
+    key = (request.ticker, request.window_size, request.learning_rate, request.epochs, request.batch_size, request.incremental,
+           *options.values())
+    try:
+        job, coalesced = training_jobs.submit(
+            key, user.id, train_and_evaluate, request.ticker,
+            window_size=request.window_size,
             learning_rate=request.learning_rate,
             epochs=request.epochs,
-            window_size=request.window_size,
-            mse=mse_val,
-            rmse=rmse_val,
-            mape=mape_val,
-            prediction_at = datetime.now().strftime("%Y-%m-%d %H:%M"),
-            user_id=user.id 
+            batch_size=request.batch_size,
+            incremental=request.incremental,
+            **options,
+            on_success=partial(store_job_result, request),
         )
-        db.add(prediction_result)
-        db.commit()
-        db.refresh(prediction_result)
-        
-        return {
-            "predictions": predictions.flatten().tolist(),
-            "actual": actual.flatten().tolist(),
-            "metrics": {"MSE": mse_val, "RMSE": rmse_val, "MAPE": mape_val}
-        }
-        
+    except QueueFullError as e:
+        raise HTTPException(status_code=429, detail=str(e))
+    return {**training_jobs.describe(job), "coalesced": coalesced}
+
+@app.get("/training_jobs/{job_id}")
+def training_job_status(job_id: str, user: User = Depends(get_current_user)):
+    return training_jobs.describe(get_training_job(job_id, user))
+
+@app.get("/training_jobs/{job_id}/events")
+async def training_job_events(job_id: str, user: User = Depends(get_current_user)):
+    """Server-Sent Events stream of the job's progress: "progress" events carry the
+    epoch, batch, loss, gradient norm (at epoch ends), batches/sec and ETA, and a
+    final "succeeded", "failed" or "cancelled" event closes the stream"""
+    job = get_training_job(job_id, user)
+
+    async def events():
+        last = None
+        while True:
+            progress = training_jobs.progress(job_id)
+            if progress is not None and progress != last:
+                last = progress
+                yield f"event: progress\ndata: {json.dumps(progress)}\n\n"
+            if job["finished_at"] is not None:
+                yield f"event: {job['state']}\ndata: {json.dumps(training_jobs.describe(job))}\n\n"
+                return
+            await asyncio.sleep(TRAINING_EVENTS_INTERVAL)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/training_jobs/{job_id}/result", response_model=NormalLstmResponseModel)
+def training_job_result(job_id: str, user: User = Depends(get_current_user)):
+    job = get_training_job(job_id, user)
+    if job["state"] == "failed":
+        raise HTTPException(status_code=500, detail=job["error"])
+    if job["state"] != "succeeded":
+        raise HTTPException(status_code=409, detail=f"Training job is {training_jobs.describe(job)['state']}")
+    return job["result"]
+
+@app.delete("/training_jobs/{job_id}")
+def cancel_training_job(job_id: str, user: User = Depends(get_current_user)):
+    job = get_training_job(job_id, user)
+    return training_jobs.describe(training_jobs.cancel(job_id, user.id))
+
+# Sweeps started by this process, finished ones are also read back from the database
+sweeps = {}
+sweeps_lock = threading.Lock()
+
+def run_sweep_job(sweep):
+    def progress(trials):
+        sweep["trials"] = trials
+
+    request = sweep["request"]
+    try:
+        trials = run_sweep(request.ticker, sweep["configs"], workers=SWEEP_WORKERS, eta=request.eta,
+                           min_epochs=request.min_epochs, progress=progress)
+        for trial in trials:
+            store_prediction_result(NormalLstmRequestModel(ticker=request.ticker, **trial["params"]), trial["metrics"],
+                                    sweep["user_id"], sweep_id=sweep["sweep_id"], epochs_run=trial["epochs_run"])
+        sweep["trials"] = public_trials(trials)
+        sweep["state"] = "succeeded"
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        sweep["error"] = str(e)
+        sweep["state"] = "failed"
+    sweep["finished_at"] = datetime.now().isoformat(timespec="seconds")
+
+def describe_sweep(sweep):
+    best = best_trial(sweep["trials"])
+    return {
+        "sweep_id": sweep["sweep_id"],
+        "ticker": sweep["request"].ticker,
+        "state": sweep["state"],
+        "error": sweep["error"],
+        "submitted_at": sweep["submitted_at"],
+        "finished_at": sweep["finished_at"],
+        "trials": sweep["trials"],
+        "best": best,
+    }
+
+@app.post("/sweeps", status_code=202)
+def submit_sweep(request: SweepRequest, user: User = Depends(get_current_user)):
+    """Starts a hyperparameter sweep for a ticker and returns its id at once. Trials
+    run in worker processes with successive halving on their training loss, and
+    every trial is stored in the user's previous predictions under the sweep id"""
+    validate_ticker(request.ticker)
+    try:
+        configs = expand_space(request.space, request.mode, request.trials, request.seed, max_trials=MAX_SWEEP_TRIALS)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if request.eta < 2 or request.min_epochs < 1:
+        raise HTTPException(status_code=400, detail="eta must be at least 2 and min_epochs at least 1")
+
+    with sweeps_lock:
+        if sum(s["state"] == "running" for s in sweeps.values()) >= MAX_CONCURRENT_SWEEPS:
+            raise HTTPException(status_code=429, detail="Too many sweeps running, try again later")
+        sweep = {
+            "sweep_id": uuid.uuid4().hex,
+            "request": request,
+            "configs": configs,
+            "user_id": user.id,
+            "state": "running",
+            "error": None,
+            "submitted_at": datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "trials": [],
+        }
+        sweeps[sweep["sweep_id"]] = sweep
+    threading.Thread(target=run_sweep_job, args=(sweep,), daemon=True).start()
+    return {"sweep_id": sweep["sweep_id"], "trials": len(configs)}
+
+@app.get("/sweeps/{sweep_id}")
+def sweep_status(sweep_id: str, user: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    sweep = sweeps.get(sweep_id)
+    if sweep is not None and sweep["user_id"] == user.id:
+        return describe_sweep(sweep)
+
+    # Sweeps from before a restart only have their stored trials
+    rows = db.query(PredictionResult).filter(PredictionResult.sweep_id == sweep_id, PredictionResult.user_id == user.id) \
+        .order_by(PredictionResult.mse).all()
+    if sweep is not None or not rows:
+        raise HTTPException(status_code=404, detail="Sweep not found")
+    return {
+        "sweep_id": sweep_id,
+        "ticker": rows[0].ticker,
+        "state": "succeeded",
+        "trials": [{column.name: getattr(row, column.name) for column in PredictionResult.__table__.columns} for row in rows],
+    }
     
     
+def predict_cache_key(ticker: str):
+    # Same model and data files always give the same result
+    return result_cache.key(
+        "predict", ticker,
+        model_registry.signature(ticker),
+        file_signature(f"./stock_data_csv/{ticker}.csv"),
+        6,
+    )
+
 @app.post("/predict", response_model=StockPredictionResponse)
 def predict(request: StockPredictionRequest):
+    validate_ticker(request.ticker)
     try:
-        loaded_model = joblib.load(os.path.join("SavedModel", f"{request.ticker}.pkl"))
-        
-        df = pd.read_csv(f"./stock_data_csv/{request.ticker}.csv")
-        
-        if(len(df)>1000):
-            df = df.iloc[-1000::1,:]
+        with span("cache"):
+            cache_key = predict_cache_key(request.ticker)
+            result = result_cache.get(cache_key)
         
-        prices = df['close'].values.reshape(-1, 1)
-
-        scaled = scaler.fit_transform(prices)
-
-        X, y = [], []
-        window = 6
-        for i in range(window, len(scaled)):
-            X.append(scaled[i-window:i])
-            y.append(scaled[i])
+        if result is None:
+            with span("load_model"):
+                loaded_model = model_registry.get(request.ticker)
+            
+            with span("read_data"):
+                df = get_stock_data(request.ticker, tail=1000)
+            
+            prices = df['close'].values.reshape(-1, 1)
 
-        X, y = np.array(X), np.array(y)
-        split = int(0.8 * len(X))
-        X_test, y_test = X[split:], y[split:]
+            with span("scale"):
+                # A scaler per request, concurrent requests would refit a shared one
+                scaler = MinMaxScaler(feature_range=(-1, 1))
+                scaled = scaler.fit_transform(prices)
 
-        predictions = []
-        for seq in X_test:
-            y_pred, _ = loaded_model.forward(seq)
-            predictions.append(y_pred[0][0])
+            with span("windows"):
+                X, y = make_windows(scaled, 6)
+                _, _, X_test, y_test = train_test_split(X, y)
 
-        predictions = np.array(predictions).reshape(-1, 1)
-        
-        predictions_original = scaler.inverse_transform(predictions)
-        actual_original = scaler.inverse_transform(y_test)
+            with span("forward"):
+                y_pred, _ = loaded_model.forward_batch(X_test)
+            predictions = y_pred[:, 0].reshape(-1, 1)
+            
+            with span("metrics"):
+                predictions_original = scaler.inverse_transform(predictions)
+                actual_original = scaler.inverse_transform(y_test)
 
-        mse_val = mse(actual_original, predictions_original)
-        rmse_val = rmse(actual_original, predictions_original)
-        mape_val = mape(actual_original, predictions_original)
+                mse_val = mse(actual_original, predictions_original)
+                rmse_val = rmse(actual_original, predictions_original)
+                mape_val = mape(actual_original, predictions_original)
+            
+            result = {
+                "predictions": predictions_original.flatten().tolist(),
+                "actual": actual_original.flatten().tolist(),
+                "metrics": {"MSE": mse_val, "RMSE": rmse_val, "MAPE": mape_val},
+            }
+            result_cache.put(cache_key, result)
         
-        # Get the convergence plot if available
+        # Get the convergence plot if available, artifacts keep it in a separate file
         plot_data = None
-        if hasattr(loaded_model, 'get_convergence_plot'):
-            plot_data = loaded_model.get_convergence_plot()
-            if plot_data:
-                plot_data = base64.b64encode(plot_data).decode('utf-8')
+        if request.include_convergence_plot:
+            with span("plot"):
+                loaded_model = model_registry.get(request.ticker)
+                if hasattr(loaded_model, 'metadata'):
+                    plot_data = load_convergence_plot(model_registry.model_dir, request.ticker)
+                elif hasattr(loaded_model, 'get_convergence_plot'):
+                    plot_data = loaded_model.get_convergence_plot()
+                if plot_data:
+                    plot_data = base64.b64encode(plot_data).decode('utf-8')
         
-        return {
-            "predictions": predictions_original.flatten().tolist(),
-            "actual": actual_original.flatten().tolist(),
-            "metrics": {"MSE": mse_val, "RMSE": rmse_val, "MAPE": mape_val},
-            "convergence_plot": plot_data
-        }
+        return {**result, "convergence_plot": plot_data}
 
     except Exception as e:
         print(f"Error details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
-@app.get("/get_available_tickers")
-async def get_available_tickers():
+@app.post("/predict_bulk")
+def predict_bulk(request: BulkPredictionRequest):
+    """/predict for many tickers in one call: every ticker's test windows are scored
+    together with its model's weights stacked, results are shared with /predict's cache"""
+    if request.sector is not None:
+        tickers = ticker_manifest.sectors()[validate_sector(request.sector)]
+    else:
+        tickers = list(dict.fromkeys(request.tickers or []))
+        for ticker in tickers:
+            validate_ticker(ticker)
+    try:
+        results, keys, missing = {}, {}, []
+        with span("cache"):
+            for ticker in tickers:
+                try:
+                    keys[ticker] = predict_cache_key(ticker)
+                except FileNotFoundError:
+                    missing.append(ticker)
+                    continue
+                results[ticker] = result_cache.get(keys[ticker])
+
+        pending = [ticker for ticker in keys if results[ticker] is None]
+        if pending:
+            with span("load_model"):
+                models = {ticker: model_registry.get(ticker) for ticker in pending}
+            with span("read_data"):
+                frames = {ticker: get_stock_data(ticker, tail=1000) for ticker in pending}
+            with span("evaluate"):
+                evaluated = evaluate_test_windows(models, frames, window=6)
+            for ticker, result in evaluated.items():
+                result_cache.put(keys[ticker], result)
+                results[ticker] = result
+
+        # Tickers without a saved model are listed instead of failing the whole request
+        return {"results": results, "missing_models": missing}
+
+    except Exception as e:
+        print(f"Error details: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-    list_of_tickers = os.listdir('./stock_data_csv')
+@app.post("/forecast")
+def forecast_prices(request: ForecastRequest):
+    """Forecasts the next horizon closes of each ticker from its latest window, feeding
+    every prediction back in; all tickers go through their models together each step"""
+    if not 1 <= request.horizon <= MAX_FORECAST_HORIZON:
+        raise HTTPException(status_code=400, detail=f"horizon must be between 1 and {MAX_FORECAST_HORIZON}")
+    tickers = list(dict.fromkeys(request.tickers))
+    for ticker in tickers:
+        validate_ticker(ticker)
+    try:
+        # Cached per ticker until its model or price file changes
+        with span("cache"):
+            keys = {
+                # Each horizon keeps its own entry, only newer models or data replace it
+                ticker: result_cache.key(
+                    "forecast", f"{ticker}-h{request.horizon}",
+                    model_registry.signature(ticker),
+                    file_signature(f"./stock_data_csv/{ticker}.csv"),
+                )
+                for ticker in tickers
+            }
+            forecasts = {ticker: result_cache.get(keys[ticker]) for ticker in tickers}
+        pending = [ticker for ticker in tickers if forecasts[ticker] is None]
 
-    # Extract filenames without extensions
-    tickers_without_extension = [os.path.splitext(ticker)[0] for ticker in list_of_tickers]
+        if pending:
+            with span("load_model"):
+                models = {ticker: model_registry.get(ticker) for ticker in pending}
+            with span("read_data"):
+                frames = {ticker: get_stock_data(ticker, tail=1000) for ticker in pending}
+            with span("forecast"):
+                forecasted = forecast(models, frames, request.horizon)
+            for ticker, result in forecasted.items():
+                result_cache.put(keys[ticker], result)
+                forecasts[ticker] = result
 
-    tickers_with_category = []
+        return {"horizon": request.horizon, "forecasts": forecasts}
 
-    for ticker in tickers_without_extension:
-        df = pd.read_csv(f"./stock_data_csv/{ticker}.csv")
-        df = df['Category'][0]
-        tickers_with_category.append((ticker,df))
-        
-    return JSONResponse(content=[{"ticker": t[0], "sector": t[1]} for t in tickers_with_category])
+    except Exception as e:
+        print(f"Error details: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+@app.get("/get_available_tickers")
+def get_available_tickers(request: Request):
+    entries = ticker_manifest.tickers()
+    return manifest_response(request, [{"ticker": e["ticker"], "sector": e["sector"]} for e in entries])
+
+@app.get("/get_ticker_manifest")
+def get_ticker_manifest(request: Request):
+    return manifest_response(request, ticker_manifest.tickers())
+
+@app.get("/get_available_sectors")
+def get_available_sectors(request: Request):
+    sectors = ticker_manifest.sectors()
+    return manifest_response(request, [{"sector": s, "tickers": t} for s, t in sorted(sectors.items())])
     
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/model_cache")
+def model_cache_stats():
+    return model_registry.snapshot()
+
+@app.get("/result_cache")
+def result_cache_stats():
+    return result_cache.snapshot()
+
+def cache_metrics(prefix, description, stats):
+    lines = metric_lines(f"stocksense_{prefix}_hits_total", f"{description} hits", "counter", [({}, stats["hits"])])
+    lines += metric_lines(f"stocksense_{prefix}_misses_total", f"{description} misses", "counter", [({}, stats["misses"])])
+    lines += metric_lines(f"stocksense_{prefix}_entries", f"{description} entries", "gauge", [({}, stats["size"])])
+    return lines
+
+@app.get("/metrics")
+def metrics():
+    """Prometheus text exposition of the request timings, caches, result writer and background jobs"""
+    lines = REQUEST_SECONDS.render() + PHASE_SECONDS.render() + REQUESTS.render()
+
+    models = model_registry.snapshot()
+    lines += cache_metrics("model_cache", "Model registry", models)
+    lines += metric_lines("stocksense_model_cache_reloads_total", "Models reloaded after their artifact changed", "counter", [({}, models["reloads"])])
+    lines += metric_lines("stocksense_model_cache_hit_ratio", "Model registry hits over lookups", "gauge", [({}, models["hit_rate"])])
+    results = result_cache.snapshot()
+    lines += cache_metrics("result_cache", "Result cache", results)
+    lines += metric_lines("stocksense_result_cache_disk_errors_total", "Results that could not be written to the disk tier", "counter", [({}, results["disk_errors"])])
+    lines += cache_metrics("auth_cache", "Authenticated user cache", user_cache.snapshot())
+
+    writer = prediction_writer.snapshot()
+    lines += metric_lines("stocksense_result_writer_queued", "Prediction results waiting to be written", "gauge", [({}, writer["queued"])])
+    lines += metric_lines("stocksense_result_writer_rows_total", "Prediction results by outcome", "counter",
+                          [({"outcome": key}, writer[key]) for key in ("written", "failed")])
+
+    states = {"queued": 0, "running": 0, "cancelling": 0}
+    epochs_per_second = 0.0
+    for job in list(training_jobs.jobs.values()):
+        if job["finished_at"] is not None:
+            continue
+        described = training_jobs.describe(job)
+        states[described["state"]] = states.get(described["state"], 0) + 1
+        progress = described["progress"]
+        if described["state"] == "running" and progress and progress["batches_per_sec"]:
+            epochs_per_second += progress["batches_per_sec"] / progress["batches"]
+    lines += metric_lines("stocksense_training_jobs", "Unfinished training jobs by state", "gauge",
+                          [({"state": state}, count) for state, count in sorted(states.items())])
+    lines += metric_lines("stocksense_training_epochs_per_second", "Training throughput of the running jobs", "gauge", [({}, epochs_per_second)])
+
+    with sweeps_lock:
+        running = sum(sweep["state"] == "running" for sweep in sweeps.values())
+    lines += metric_lines("stocksense_sweeps_running", "Hyperparameter sweeps in progress", "gauge", [({}, running)])
+    return PlainTextResponse("\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
 @app.post("/get_sectorwise_prediction", response_model=SectorWisePredictionResponse)
 def get_sectorwise_prediction(request: SectorWisePredictionRequest):
+    # Merged files and sector models are named by the lower cased sector
+    sector = sector_key(validate_sector(request.sector))
     try:
-        loaded_model = joblib.load(os.path.join("SavedModel", f"{request.sector}.pkl"))
+        data_path = merged_path(sector)
+        with span("cache"):
+            cache_key = result_cache.key(
+                "sectorwise", sector,
+                model_registry.signature(sector),
+                file_signature(data_path),
+                6,
+            )
+            result = result_cache.get(cache_key)
+        if result is not None:
+            return SectorWisePredictionResponse(**result)
         
-        df = pd.read_csv(f"./merged_sectorwise_data/merged_sector_data_latest_{request.sector}.csv")
+        with span("load_model"):
+            loaded_model = model_registry.get(sector)
+        
+        with span("read_data"):
+            df = read_sector_prices(sector)
         
         prices = df['close'].values.reshape(-1, 1)
 
-        scaled = scaler.fit_transform(prices)
+        with span("scale"):
+            # A scaler per request, concurrent requests would refit a shared one
+            scaler = MinMaxScaler(feature_range=(-1, 1))
+            scaled = scaler.fit_transform(prices)
 
-        X, y = [], []
-        window = 6
-        for i in range(window, len(scaled)):
-            X.append(scaled[i-window:i])
-            y.append(scaled[i])
+        with span("windows"):
+            X, y = make_windows(scaled, 6)
+            _, _, X_test, y_test = train_test_split(X, y)
 
-        X, y = np.array(X), np.array(y)
-        split = int(0.8 * len(X))
-        X_test, y_test = X[split:], y[split:]
+        with span("forward"):
+            y_pred, _ = loaded_model.forward_batch(X_test)
+        predictions = y_pred[:, 0].reshape(-1, 1)
         
-        split = int(0.8 * len(X))
-        X_test = X[split:]
-        y_test = y[split:]
-
-        predictions = []
-        for seq in X_test:
-            y_pred, _ = loaded_model.forward(seq)
-            predictions.append(y_pred[0][0])
+        with span("metrics"):
+            predictions_original = scaler.inverse_transform(predictions)
+            actual_original = scaler.inverse_transform(y_test)
 
-        predictions = np.array(predictions).reshape(-1, 1)
-        
-        predictions_original = scaler.inverse_transform(predictions)
-        actual_original = scaler.inverse_transform(y_test)
+            mse_val = mse(actual_original, predictions_original)
+            rmse_val = rmse(actual_original, predictions_original)
+            mape_val = mape(actual_original, predictions_original)
 
-        mse_val = mse(actual_original, predictions_original)
-        rmse_val = rmse(actual_original, predictions_original)
-        mape_val = mape(actual_original, predictions_original)
-
-        return SectorWisePredictionResponse(
-            predictions=predictions_original.flatten().tolist(),
-            actual=actual_original.flatten().tolist(),
-            metrics={"MSE": mse_val, "RMSE": rmse_val, "MAPE": mape_val}
-        )
+        result = {
+            "predictions": predictions_original.flatten().tolist(),
+            "actual": actual_original.flatten().tolist(),
+            "metrics": {"MSE": mse_val, "RMSE": rmse_val, "MAPE": mape_val},
+        }
+        result_cache.put(cache_key, result)
+        return SectorWisePredictionResponse(**result)
 
     except Exception as e:
         print(f"Error details: {e}")
         raise HTTPException(status_code=500, detail=str(e))
     
+def file_response(request: Request, path: str, media_type: str, cache_control: str):
+    # Conditional requests get a 304 while the file is unchanged
+    stat = os.stat(path)
+    etag = f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+    headers = {"ETag": etag, "Last-Modified": formatdate(stat.st_mtime, usegmt=True), "Cache-Control": cache_control}
+    if_none_match = request.headers.get("if-none-match")
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_none_match is not None:
+        if if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]:
+            return Response(status_code=304, headers=headers)
+    elif if_modified_since is not None:
+        try:
+            if int(stat.st_mtime) <= parsedate_to_datetime(if_modified_since).timestamp():
+                return Response(status_code=304, headers=headers)
+        except (TypeError, ValueError):
+            pass
+    return FileResponse(path, media_type=media_type, headers=headers)
+
+eda_lock = threading.Lock()
+
+def eda_document(ticker: str):
+    """Path of the ticker's EDA document, converting the notebook pickle on first use"""
+    path = document_path(ticker)
+    if not os.path.exists(path):
+        with eda_lock:
+            if not os.path.exists(path) and not convert_legacy(ticker):
+                raise HTTPException(status_code=404, detail=f"No EDA results for {ticker}, run build_eda.py")
+    return path
+
 @app.get("/eda/{ticker}")
-def get_eda_results(ticker: str):
+def get_eda_results(ticker: str, request: Request):
+    """Statistics, missing values and correlation matrix of the ticker, with the URLs of its plots"""
+    return file_response(request, eda_document(ticker), "application/json", "no-cache")
+
+@app.get("/eda/{ticker}/plots/{plot}")
+def get_eda_plot(ticker: str, plot: str, request: Request):
+    if plot not in PLOTS:
+        raise HTTPException(status_code=404, detail=f"Unknown plot {plot}")
+    eda_document(ticker)
+    path = plot_path(ticker, plot)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"No {plot} for {ticker}")
+    return file_response(request, path, "image/png", f"public, max-age={EDA_PLOT_MAX_AGE}")
+
+# Points per series of /price_history when the client doesn't set a budget, and the most it may ask for
+PRICE_HISTORY_POINTS = 1000
+MAX_PRICE_HISTORY_POINTS = 20000
+
+@app.get("/price_history")
+def price_history(
+    request: Request,
+    tickers: Optional[str] = None,
+    sector: Optional[str] = None,
+    start: Optional[date] = None,
+    end: Optional[date] = None,
+    points: int = Query(PRICE_HISTORY_POINTS, ge=3, le=MAX_PRICE_HISTORY_POINTS),
+    method: str = "lttb",
+    fields: str = "close",
+    format: str = Query("json", pattern="^(json|binary)$"),
+):
+    """Daily prices of comma separated tickers, or of every ticker in a sector, from start
+    to end inclusive. Each series is downsampled to at most points by its first field,
+    with LTTB or the min and max of each bucket. format=binary returns float32 arrays
+    behind a JSON header instead of JSON lists, see models/history.to_binary"""
+    if (tickers is None) == (sector is None):
+        raise HTTPException(status_code=400, detail="Pass either tickers or sector")
+    if sector is not None:
+        names = ticker_manifest.sectors()[validate_sector(sector)]
+    else:
+        names = list(dict.fromkeys(name.strip() for name in tickers.split(",") if name.strip()))
+        for name in names:
+            validate_ticker(name)
+
+    # Weak, as the same series is sent with different content encodings
+    etag = 'W/"{}"'.format(result_cache.key(
+        "price_history", format,
+        [file_signature(f"./stock_data_csv/{name}.csv") for name in names],
+        sorted(request.query_params.multi_items()),
+    ))
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if etag in [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]:
+        return Response(status_code=304, headers=headers)
+
     try:
-        eda_results = joblib.load(f"./EDA/EDA_Results/eda_results_{ticker}.joblib")
-
-        # Convert pandas Series/DataFrame to dictionaries
-        statistics = eda_results.get("eda_statistics", pd.Series()).to_dict()
-        missing_values = eda_results.get("missing_values", pd.Series()).to_dict()
-        correlation_matrix = eda_results.get("correlation_matrix", pd.DataFrame()).to_dict()
-
-        # Convert Timestamp objects to strings and NaN values to null
-        def convert_for_json(data):
-            if isinstance(data, dict):
-                return {key: convert_for_json(value) for key, value in data.items()}
-            elif isinstance(data, (list, tuple)):
-                return [convert_for_json(item) for item in data]
-            elif isinstance(data, pd.Timestamp):
-                return data.isoformat()  # Convert Timestamp to ISO format string
-            elif isinstance(data, (float, np.floating)) and np.isnan(data):
-                return None  # Replace NaN with null
-            else:
-                return data
-
-        statistics = convert_for_json(statistics)
-        missing_values = convert_for_json(missing_values)
-        correlation_matrix = convert_for_json(correlation_matrix)
-
-        # Process plots
-        plots = {}
-        for plot_name in ["closing_price_plot", "moving_avg_plot", "heatmap_plot"]:
-            img_stream = eda_results.get(plot_name)
-            if img_stream:
-                img_stream.seek(0)
-                plots[plot_name] = base64.b64encode(img_stream.read()).decode("utf-8")
-        
-        return JSONResponse(content={
-            "statistics": statistics,
-            "missing_values": missing_values,
-            "correlation_matrix": correlation_matrix,
-            "plots": plots
-        })
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        fields = parse_fields(fields)
+        with span("read_data"):
+            frames = {name: get_stock_data(name, start=start, end=end) for name in names}
+        with span("downsample"):
+            series = {name: price_series(frames[name], fields, points, method) for name in names}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    with span("encode"):
+        if format == "binary":
+            body, media_type = to_binary(series, fields), BINARY_MEDIA_TYPE
+        else:
+            body, media_type = json.dumps(to_json(series, fields)).encode(), "application/json"
+        body, encoding = compress(body, request.headers.get("accept-encoding"))
+    if encoding is not None:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=media_type, headers=headers)
     
 
-@app.get("/previous_predictions", response_model=List[PredictionResultResponseModel])
-def previous_predictions(db: Session = Depends(get_db), token: str = Depends(oauth2_scheme)):
-    try:
-        # Decode token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
+# Page size of /previous_predictions when the client doesn't ask for one, and the largest it may ask for
+HISTORY_PAGE_SIZE = 50
+MAX_HISTORY_PAGE_SIZE = 500
 
-        if username is None:
-            raise HTTPException(status_code=401, detail="Invalid token")
+def prediction_filters(
+    ticker: Optional[str] = None,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    sweep_id: Optional[str] = None,
+    min_learning_rate: Optional[float] = None,
+    max_learning_rate: Optional[float] = None,
+    min_epochs: Optional[int] = None,
+    max_epochs: Optional[int] = None,
+    min_window_size: Optional[int] = None,
+    max_window_size: Optional[int] = None,
+    min_batch_size: Optional[int] = None,
+    max_batch_size: Optional[int] = None,
+):
+    """Conditions on a user's prediction history: exact ticker or sweep, created_at in
+    [start, end) and inclusive hyperparameter ranges. Rows without created_at, which
+    the backfill couldn't parse, can't be paged and are left out everywhere"""
+    conditions = [PredictionResult.created_at.isnot(None)]
+    if ticker is not None:
+        conditions.append(PredictionResult.ticker == ticker)
+    if sweep_id is not None:
+        conditions.append(PredictionResult.sweep_id == sweep_id)
+    if start is not None:
+        conditions.append(PredictionResult.created_at >= start)
+    if end is not None:
+        conditions.append(PredictionResult.created_at < end)
+    ranges = {
+        PredictionResult.learning_rate: (min_learning_rate, max_learning_rate),
+        PredictionResult.epochs: (min_epochs, max_epochs),
+        PredictionResult.window_size: (min_window_size, max_window_size),
+        PredictionResult.batch_size: (min_batch_size, max_batch_size),
+    }
+    for column, (low, high) in ranges.items():
+        if low is not None:
+            conditions.append(column >= low)
+        if high is not None:
+            conditions.append(column <= high)
+    return conditions
 
-        # Fetch user
-        user = db.query(User).filter(User.username == username).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
+def encode_cursor(row: PredictionResult):
+    return base64.urlsafe_b64encode(f"{row.created_at.isoformat()}|{row.id}".encode()).decode()
 
-        # Fetch predictions
-        predictions = db.query(PredictionResult).options(joinedload(PredictionResult.user)).filter(PredictionResult.user_id == user.id).all()
+def decode_cursor(cursor: str):
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-        if not predictions:
-            raise HTTPException(status_code=404, detail="No predictions found for this user")
+@app.get("/previous_predictions", response_model=List[PredictionResultResponseModel])
+def previous_predictions(response: Response, cursor: Optional[str] = None,
+                         limit: int = Query(HISTORY_PAGE_SIZE, ge=1, le=MAX_HISTORY_PAGE_SIZE),
+                         conditions: list = Depends(prediction_filters),
+                         db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """The user's predictions, newest first, a page at a time. When there are more,
+    the X-Next-Cursor header holds the cursor that fetches the next page"""
+    query = db.query(PredictionResult).filter(PredictionResult.user_id == user.id, *conditions)
+    if cursor is not None:
+        # Keyset pagination: seek past the last row of the previous page on the
+        # (user_id, created_at) index instead of counting an offset
+        query = query.filter(tuple_(PredictionResult.created_at, PredictionResult.id) < decode_cursor(cursor))
+    with span("query"):
+        rows = query.order_by(PredictionResult.created_at.desc(), PredictionResult.id.desc()).limit(limit + 1).all()
 
-        return predictions
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(rows[-1])
+    return rows
 
-    except JWTError as e:
-        raise HTTPException(status_code=401, detail=f"JWT Error: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
-    
\ No newline at end of file
+@app.get("/previous_predictions/summary")
+def previous_predictions_summary(conditions: list = Depends(prediction_filters),
+                                 db: Session = Depends(get_db), user: User = Depends(get_current_user)):
+    """Per ticker run count with the best and mean of each metric, over the same filters as /previous_predictions"""
+    with span("query"):
+        rows = db.query(
+            PredictionResult.ticker,
+            func.count(PredictionResult.id),
+            func.min(PredictionResult.mse), func.avg(PredictionResult.mse),
+            func.min(PredictionResult.rmse), func.avg(PredictionResult.rmse),
+            func.min(PredictionResult.mape), func.avg(PredictionResult.mape),
+            func.max(PredictionResult.created_at),
+        ).filter(PredictionResult.user_id == user.id, *conditions).group_by(PredictionResult.ticker).order_by(PredictionResult.ticker).all()
+
+    tickers = [
+        {
+            "ticker": ticker,
+            "runs": runs,
+            "best": {"MSE": best_mse, "RMSE": best_rmse, "MAPE": best_mape},
+            "mean": {"MSE": mean_mse, "RMSE": mean_rmse, "MAPE": mean_mape},
+            "last_run_at": last_run_at,
+        }
+        for ticker, runs, best_mse, mean_mse, best_rmse, mean_rmse, best_mape, mean_mape, last_run_at in rows
+    ]
+    return {"runs": sum(t["runs"] for t in tickers), "tickers": tickers}
@@ -0,0 +1,32 @@
+import os
+import joblib
+from sklearn.preprocessing import MinMaxScaler
+from models.artifact import fingerprint_prices, has_artifact, save_model
+from models.sector_merge import merged_path, read_sector_prices
+from models.stock import get_stock_data
+
+# Converts the pickled LSTM objects in SavedModel/ to the artifact format.
+# The pickles do not record what they were trained on, so the scaler bounds
+# and data fingerprint are taken from the data the API currently serves them
+# with. The .pkl files are left in place; the registry prefers the artifacts.
+
+save_dir = "SavedModel"
+window = 6
+
+for file in sorted(os.listdir(save_dir)):
+    name, ext = os.path.splitext(file)
+    if ext != ".pkl" or has_artifact(save_dir, name):
+        continue
+
+    model = joblib.load(os.path.join(save_dir, file))
+
+    if os.path.exists(merged_path(name)):
+        df = read_sector_prices(name)
+    else:
+        df = get_stock_data(name, tail=1000)
+
+    scaler = MinMaxScaler(feature_range=(-1, 1))
+    scaler.fit(df['close'].values.reshape(-1, 1))
+
+    save_model(model, save_dir, name, window=window, scaler=scaler, fingerprint=fingerprint_prices(df))
+    print(f"Migrated {file}")
@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+from datetime import datetime
+
+import numpy as np
+
+from models.lstm import LSTM
+
+# Version of the on-disk layout written by save_model
+FORMAT_VERSION = 1
+
+# A model called <name> is stored in the model directory as
+#   <name>.json         metadata: hyperparameters, weight layout, scaler bounds, data fingerprint
+#   <name>.weights.npy  every inference weight in one flat array, memory-mappable
+#   <name>.state.npz    optimizer velocity and loss history, only needed to keep training
+#   <name>.png          convergence plot, only read when a response includes it
+# The metadata is written last, so its presence marks a complete artifact.
+
+
+def _path(model_dir, name, suffix):
+    return os.path.join(model_dir, name + suffix)
+
+
+def metadata_path(model_dir, name):
+    return _path(model_dir, name, ".json")
+
+
+def has_artifact(model_dir, name):
+    return os.path.exists(metadata_path(model_dir, name))
+
+
+def _atomic_write(path, write):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        write(f)
+    os.replace(tmp_path, path)
+
+
+def fingerprint_prices(df):
+    """Identifies the price rows a model was trained on"""
+    closes = np.ascontiguousarray(df["close"].values, dtype=np.float64)
+    digest = hashlib.sha1(closes.tobytes())
+    dates = None
+    if "published_date" in df.columns and len(df):
+        dates = df["published_date"].astype(str)
+        digest.update("".join(dates).encode())
+    return {
+        "sha1": digest.hexdigest(),
+        "rows": int(len(df)),
+        "first_date": dates.iloc[0][:10] if dates is not None else None,
+        "last_date": dates.iloc[-1][:10] if dates is not None else None,
+    }
+
+
+def save_model(model, model_dir, name, window, scaler=None, fingerprint=None):
+    os.makedirs(model_dir, exist_ok=True)
+    names = list(model.params)
+    flat = np.concatenate([np.ravel(model.params[p]) for p in names])
+
+    _atomic_write(_path(model_dir, name, ".weights.npy"), lambda f: np.save(f, flat))
+    _atomic_write(
+        _path(model_dir, name, ".state.npz"),
+        lambda f: np.savez(
+            f,
+            loss_history=np.asarray(getattr(model, "loss_history", []), dtype=np.float64),
+            **{f"velocity_{p}": model.velocity[p] for p in names},
+        ),
+    )
+
+    plot = getattr(model, "convergence_plot_data", None)
+    plot_path = _path(model_dir, name, ".png")
+    if plot:
+        _atomic_write(plot_path, lambda f: f.write(plot))
+    elif os.path.exists(plot_path):
+        os.remove(plot_path)
+
+    metadata = {
+        "format_version": FORMAT_VERSION,
+        "name": name,
+        "input_size": model.input_size,
+        "hidden_size": model.hidden_size,
+        "output_size": model.output_size,
+        "learning_rate": model.lr,
+        "beta": model.beta,
+        "max_grad_norm": model.max_grad_norm,
+        "window": window,
+        "dtype": str(flat.dtype),
+        "params": [[p, list(np.shape(model.params[p]))] for p in names],
+        "scaler": None if scaler is None else {
+            "feature_range": list(scaler.feature_range),
+            "data_min": float(scaler.data_min_[0]),
+            "data_max": float(scaler.data_max_[0]),
+        },
+        "data": fingerprint,
+        "final_loss": float(model.loss_history[-1]) if getattr(model, "loss_history", None) else None,
+        "saved_at": datetime.now().isoformat(timespec="seconds"),
+    }
+    _atomic_write(metadata_path(model_dir, name), lambda f: f.write(json.dumps(metadata, indent=2).encode()))
+    return metadata
+
+
+def load_metadata(model_dir, name):
+    with open(metadata_path(model_dir, name)) as f:
+        return json.load(f)
+
+
+def load_model(model_dir, name, mmap=True, with_state=False):
+    """Rebuilds the LSTM from its weights. With mmap the weights are read-only views of
+    the mapped file; pass mmap=False (and with_state=True) to keep training the model"""
+    metadata = load_metadata(model_dir, name)
+    if metadata["format_version"] > FORMAT_VERSION:
+        raise ValueError(f"Model {name} uses artifact format {metadata['format_version']}, newer than this code")
+
+    flat = np.load(_path(model_dir, name, ".weights.npy"), mmap_mode="r" if mmap else None)
+    model = LSTM(
+        input_size=metadata["input_size"],
+        hidden_size=metadata["hidden_size"],
+        output_size=metadata["output_size"],
+        learning_rate=metadata["learning_rate"],
+        beta=metadata["beta"],
+        dtype=metadata.get("dtype", "float64"),
+    )
+    model.max_grad_norm = metadata["max_grad_norm"]
+
+    offset = 0
+    for p, shape in metadata["params"]:
+        size = int(np.prod(shape))
+        model.params[p] = flat[offset:offset + size].reshape(shape)
+        setattr(model, p, model.params[p])
+        offset += size
+
+    model.loss_history = []
+    model.convergence_plot_data = None
+    if with_state:
+        with np.load(_path(model_dir, name, ".state.npz")) as state:
+            model.loss_history = state["loss_history"].tolist()
+            model.velocity = {p: state[f"velocity_{p}"] for p, _ in metadata["params"]}
+    model.metadata = metadata
+    return model
+
+
+def load_convergence_plot(model_dir, name):
+    try:
+        with open(_path(model_dir, name, ".png"), "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
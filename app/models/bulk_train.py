@@ -0,0 +1,122 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sklearn.preprocessing import MinMaxScaler
+from threadpoolctl import threadpool_limits
+
+from models.artifact import fingerprint_prices, has_artifact, load_metadata, save_model
+from models.incremental import FullRetrain, fine_tune, training_cutoff
+from models.lstm import LSTM
+from models.windowing import make_windows, train_test_split
+
+BLAS_THREAD_VARIABLES = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+
+def _limit_blas_threads():
+    # One BLAS thread per worker process, the pool already uses every core
+    threadpool_limits(1)
+
+
+def is_up_to_date(save_dir, name, fingerprint):
+    """True when the saved model was trained on exactly this data"""
+    if not has_artifact(save_dir, name):
+        return False
+    trained_on = load_metadata(save_dir, name).get("data") or {}
+    return trained_on.get("sha1") == fingerprint["sha1"]
+
+
+def train_one(name, df, save_dir, window=6, epochs=15, batch_size=15, learning_rate=0.0014, hidden_size=30,
+              incremental=False, fine_tune_epochs=3, dtype="float64"):
+    """Trains and saves the model for one ticker or sector, returns its summary row.
+
+    With incremental the saved model is fine-tuned on the windows added since it
+    was trained, unless the drift and regression guards ask for a full retrain.
+    """
+    start = time.perf_counter()
+    fingerprint = fingerprint_prices(df)
+    status, note = "trained", None
+
+    if incremental and has_artifact(save_dir, name):
+        try:
+            model, scaler, update = fine_tune(save_dir, name, df, window=window, learning_rate=learning_rate,
+                                              hidden_size=hidden_size, epochs=fine_tune_epochs, batch_size=batch_size,
+                                              dtype=dtype)
+            fingerprint["trained_through"] = update["trained_through"]
+            status, note = "fine-tuned", f"{update['new_windows']} new windows"
+        except FullRetrain as e:
+            note = str(e)
+
+    if status == "trained":
+        model = LSTM(input_size=1, hidden_size=hidden_size, output_size=1, learning_rate=learning_rate, dtype=dtype)
+        scaler = MinMaxScaler(feature_range=(-1, 1))
+
+        prices = df['close'].values.reshape(-1, 1)
+        scaled = scaler.fit_transform(prices)
+        X, y = make_windows(scaled, window)
+        X_train, y_train, _, _ = train_test_split(X, y)
+
+        model.train(X_train, y_train, epochs=epochs, batch_size=batch_size)
+        fingerprint["trained_through"] = training_cutoff(df, window, len(X_train))
+
+    save_model(model, save_dir, name, window=window, scaler=scaler, fingerprint=fingerprint)
+
+    return {
+        "name": name,
+        "status": status,
+        "note": note,
+        "seconds": time.perf_counter() - start,
+        "final_loss": float(model.loss_history[-1]) if model.loss_history else None,
+    }
+
+
+def run_bulk_training(datasets, save_dir, workers=None, force=False, **train_kwargs):
+    """Trains a model per entry of datasets ({name: price DataFrame}) across a process pool.
+
+    Models whose artifact already records the current data fingerprint are
+    skipped unless force is set. Returns one summary row per name.
+    """
+    os.makedirs(save_dir, exist_ok=True)
+    summary = []
+    pending = {}
+    for name, df in datasets.items():
+        if not force and is_up_to_date(save_dir, name, fingerprint_prices(df)):
+            summary.append({"name": name, "status": "skipped", "seconds": 0.0, "final_loss": None})
+        else:
+            pending[name] = df
+
+    if not pending:
+        return sorted(summary, key=lambda row: row["name"])
+
+    workers = min(workers or os.cpu_count() or 1, len(pending))
+    # Worker processes inherit these before numpy is imported under spawn
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ.setdefault(variable, "1")
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_limit_blas_threads) as pool:
+        futures = {pool.submit(train_one, name, df, save_dir, **train_kwargs): name for name, df in pending.items()}
+        for future in as_completed(futures):
+            name = futures[future]
+            try:
+                row = future.result()
+            except Exception as e:
+                row = {"name": name, "status": f"failed: {e}", "seconds": 0.0, "final_loss": None}
+            summary.append(row)
+            note = f" ({row['note']})" if row.get("note") else ""
+            print(f"[{len(summary)}/{len(datasets)}] {name}: {row['status']}{note}")
+
+    return sorted(summary, key=lambda row: row["name"])
+
+
+def print_summary(summary):
+    print(f"\n{'name':<20} {'status':<10} {'seconds':>8} {'final loss':>11}")
+    for row in summary:
+        loss = f"{row['final_loss']:.5f}" if row["final_loss"] is not None else "-"
+        print(f"{row['name']:<20} {row['status']:<10} {row['seconds']:>8.2f} {loss:>11}")
+
+    counts = {"trained": 0, "fine-tuned": 0, "skipped": 0, "failed": 0}
+    for row in summary:
+        counts[row["status"].split(":")[0]] += 1
+    wall = sum(row["seconds"] for row in summary)
+    print(f"\n{counts['trained']} trained, {counts['fine-tuned']} fine-tuned, {counts['skipped']} skipped, "
+          f"{counts['failed']} failed, {wall:.1f}s of training time")
@@ -0,0 +1,72 @@
+import queue
+import threading
+
+_STOP = object()
+
+
+class BatchWriter:
+    """Inserts ORM rows from a background thread so request handlers hand them off
+    instead of waiting on the database lock. Rows queued while a transaction is
+    being committed go into the next one together, one commit per batch."""
+
+    def __init__(self, session_factory, max_batch=500):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.stats = {"written": 0, "batches": 0, "failed": 0}
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="batch-writer", daemon=True)
+        self._thread.start()
+
+    def add(self, row):
+        self._queue.put(row)
+
+    def flush(self):
+        """Blocks until every row added so far is committed or has failed"""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [row for row in batch if row is not _STOP]
+            if rows:
+                self._write(rows)
+            for _ in batch:
+                self._queue.task_done()
+            if len(rows) < len(batch):
+                return
+
+    def _write(self, rows):
+        db = self.session_factory()
+        try:
+            db.add_all(rows)
+            db.commit()
+            self.stats["written"] += len(rows)
+            self.stats["batches"] += 1
+        except Exception as e:
+            db.rollback()
+            # Retry one by one so a bad row doesn't take the rest of the batch with it
+            for row in rows:
+                try:
+                    db.add(row)
+                    db.commit()
+                    self.stats["written"] += 1
+                except Exception as row_error:
+                    db.rollback()
+                    self.stats["failed"] += 1
+                    print(f"Dropped {type(row).__name__} row: {row_error}")
+            print(f"Batch of {len(rows)} rows failed ({e}), retried row by row")
+        finally:
+            db.close()
+
+    def snapshot(self):
+        return {**self.stats, "queued": self._queue.qsize()}
@@ -0,0 +1,193 @@
+import io
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+CSV_DIR = "./stock_data_csv"
+EDA_DIR = "./EDA/EDA_Results"
+STATE_FILE = ".eda_state.json"
+PLOTS = ("closing_price_plot", "moving_avg_plot", "heatmap_plot")
+
+
+def document_path(ticker, eda_dir=EDA_DIR):
+    return os.path.join(eda_dir, f"eda_{ticker}.json")
+
+
+def plot_path(ticker, plot, eda_dir=EDA_DIR):
+    return os.path.join(eda_dir, f"eda_{ticker}_{plot}.png")
+
+
+def legacy_path(ticker, eda_dir=EDA_DIR):
+    # Pickles written by EDA/IterativeStockEDA.ipynb
+    return os.path.join(eda_dir, f"eda_results_{ticker}.joblib")
+
+
+def to_json_safe(data):
+    """Timestamps to ISO strings and NaN to None, recursively"""
+    if isinstance(data, dict):
+        return {str(key): to_json_safe(value) for key, value in data.items()}
+    if isinstance(data, (list, tuple)):
+        return [to_json_safe(item) for item in data]
+    if isinstance(data, pd.Timestamp):
+        return data.isoformat()
+    if isinstance(data, (float, np.floating)):
+        return None if np.isnan(data) else float(data)
+    if isinstance(data, np.integer):
+        return int(data)
+    return data
+
+
+def summarize(df):
+    """Descriptive statistics, missing value counts and the correlation matrix of a
+    ticker's rows, the tables of EDA/IterativeStockEDA.ipynb"""
+    numeric = df.drop(columns=[c for c in df.columns if c.lower() in ('status', 'category')])
+    return {
+        "statistics": to_json_safe(df.describe().to_dict()),
+        "missing_values": to_json_safe(df.isnull().sum().to_dict()),
+        "correlation_matrix": to_json_safe(numeric.corr().to_dict()),
+    }
+
+
+def _png(fig):
+    import matplotlib.pyplot as plt
+
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    plt.close(fig)
+    return buf.getvalue()
+
+
+def render_plots(ticker, df, correlation):
+    """The notebook's closing price, moving average and correlation heatmap plots as PNG bytes"""
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 5))
+    ax.plot(df["published_date"], df["close"], label="Close Price")
+    ax.set_title(f"{ticker} Stock Closing Price Over Time")
+    ax.set_xlabel("Date")
+    ax.set_ylabel("Close Price")
+    ax.legend()
+    plots = {"closing_price_plot": _png(fig)}
+
+    fig, ax = plt.subplots(figsize=(12, 6))
+    ax.plot(df['close'].values, label='Closing Price', alpha=0.8)
+    ax.plot(df['close'].rolling(window=10).mean().values, label='10-day MA', linestyle='dashed')
+    ax.plot(df['close'].rolling(window=50).mean().values, label='50-day MA', linestyle='dashed')
+    ax.legend()
+    plots["moving_avg_plot"] = _png(fig)
+
+    fig, ax = plt.subplots(figsize=(8, 5))
+    image = ax.imshow(correlation.values, cmap="coolwarm", vmin=-1, vmax=1)
+    ax.set_xticks(range(len(correlation.columns)), correlation.columns, rotation=45, ha="right")
+    ax.set_yticks(range(len(correlation.index)), correlation.index)
+    for (i, j), value in np.ndenumerate(correlation.values):
+        if not np.isnan(value):
+            ax.text(j, i, f"{value:.2f}", ha="center", va="center", fontsize=7)
+    fig.colorbar(image)
+    ax.set_title(f"{ticker} Feature Correlation Matrix")
+    fig.tight_layout()
+    plots["heatmap_plot"] = _png(fig)
+    return plots
+
+
+def _write(path, data):
+    # Readers never see a half written file
+    with open(path + ".tmp", "wb") as f:
+        f.write(data)
+    os.replace(path + ".tmp", path)
+
+
+def save_eda(ticker, tables, plots, eda_dir=EDA_DIR):
+    """Writes the plots, then the JSON document the API serves as is"""
+    for plot, png in plots.items():
+        _write(plot_path(ticker, plot, eda_dir), png)
+    document = {
+        "ticker": ticker,
+        "generated_at": datetime.now().isoformat(timespec="seconds"),
+        **tables,
+        "plots": {plot: f"/eda/{ticker}/plots/{plot}" for plot in plots},
+    }
+    _write(document_path(ticker, eda_dir), json.dumps(document).encode())
+    return document
+
+
+def generate_eda(ticker, csv_dir=CSV_DIR, eda_dir=EDA_DIR):
+    """Runs the EDA of one ticker's CSV and saves it. Module-level so it can run in a worker process"""
+    df = pd.read_csv(os.path.join(csv_dir, f"{ticker}.csv"))
+    df["published_date"] = pd.to_datetime(df["published_date"])
+    df = df.sort_values("published_date").reset_index(drop=True)
+
+    tables = summarize(df)
+    correlation = pd.DataFrame(tables["correlation_matrix"]).astype(float)
+    save_eda(ticker, tables, render_plots(ticker, df, correlation), eda_dir)
+    return ticker
+
+
+def convert_legacy(ticker, eda_dir=EDA_DIR):
+    """Saves a notebook pickle in the served format. Returns False when there is none"""
+    import joblib
+
+    if not os.path.exists(legacy_path(ticker, eda_dir)):
+        return False
+    results = joblib.load(legacy_path(ticker, eda_dir))
+    tables = {
+        "statistics": to_json_safe(results.get("eda_statistics", pd.Series()).to_dict()),
+        "missing_values": to_json_safe(results.get("missing_values", pd.Series()).to_dict()),
+        "correlation_matrix": to_json_safe(results.get("correlation_matrix", pd.DataFrame()).to_dict()),
+    }
+    plots = {plot: results[plot].getvalue() for plot in PLOTS if results.get(plot) is not None}
+    save_eda(ticker, tables, plots, eda_dir)
+    return True
+
+
+def _load_state(eda_dir):
+    try:
+        with open(os.path.join(eda_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(eda_dir, state):
+    _write(os.path.join(eda_dir, STATE_FILE), json.dumps(state, indent=1, sort_keys=True).encode())
+
+
+def update_eda(csv_dir=CSV_DIR, eda_dir=EDA_DIR, tickers=None, workers=None, force=False):
+    """Regenerates the EDA of every ticker (or of tickers) whose CSV changed since its
+    last run, across a process pool. Returns {ticker: "generated" | "failed: ..."}"""
+    os.makedirs(eda_dir, exist_ok=True)
+    state = {} if force else _load_state(eda_dir)
+
+    pending = {}
+    for name in sorted(os.listdir(csv_dir)):
+        ticker, ext = os.path.splitext(name)
+        if ext != ".csv" or (tickers and ticker not in tickers):
+            continue
+        stat = os.stat(os.path.join(csv_dir, name))
+        signature = [stat.st_mtime_ns, stat.st_size]
+        if state.get(ticker) != signature or not os.path.exists(document_path(ticker, eda_dir)):
+            pending[ticker] = signature
+
+    report = {}
+    if not pending:
+        return report
+
+    with ProcessPoolExecutor(max_workers=min(workers or os.cpu_count() or 1, len(pending))) as pool:
+        futures = {pool.submit(generate_eda, ticker, csv_dir, eda_dir): ticker for ticker in pending}
+        for future in as_completed(futures):
+            ticker = futures[future]
+            try:
+                future.result()
+                state[ticker] = pending[ticker]
+                report[ticker] = "generated"
+            except Exception as e:
+                report[ticker] = f"failed: {e}"
+
+    _save_state(eda_dir, state)
+    return report
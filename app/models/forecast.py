@@ -0,0 +1,64 @@
+import numpy as np
+
+from models.stacked import group_models, min_max_bounds, stack_params, stacked_forward
+
+# Recent rows whose weekdays define the trading week, and the share of them a
+# weekday needs to count as a trading day
+TRADING_WEEK_ROWS = 250
+MIN_WEEKDAY_SHARE = 0.05
+
+
+def recursive_forecast(stacked, windows, horizon):
+    """Feeds each model's prediction back as its newest input for horizon steps.
+    windows is (models, window) in scaled units, returns (models, horizon)"""
+    windows = np.array(windows, dtype=np.float64)
+    steps = np.empty((len(windows), horizon))
+    for step in range(horizon):
+        y = stacked_forward(stacked, windows[:, None, :, None])[:, 0, 0]
+        steps[:, step] = y
+        windows = np.concatenate([windows[:, 1:], y[:, None]], axis=1)
+    return steps
+
+
+def next_trading_days(dates, horizon):
+    """The horizon calendar days after the last date that fall on a weekday the
+    ticker usually trades on (the exchange trades Sunday to Thursday)"""
+    dates = np.asarray(dates, dtype='datetime64[D]')[-TRADING_WEEK_ROWS:]
+    # 1970-01-01 was a Thursday, shift so Monday is 0 like datetime.weekday()
+    counts = np.bincount((dates.astype(np.int64) + 3) % 7, minlength=7)
+    trading = np.flatnonzero(counts >= MIN_WEEKDAY_SHARE * len(dates))
+    if not len(trading):
+        trading = np.arange(7)
+
+    candidates = dates.max() + np.arange(1, 7 * (horizon // len(trading) + 2))
+    days = candidates[np.isin((candidates.astype(np.int64) + 3) % 7, trading)][:horizon]
+    return [str(day) for day in days]
+
+
+def forecast(models, frames, horizon, window=6):
+    """Forecasts the next horizon closes of every name in models ({name: LSTM}) from
+    the last window closes of frames ({name: price DataFrame}).
+
+    Each series is min-max scaled to (-1, 1) over its rows, like /predict does.
+    Models with the same weight shapes and window are run as one stack; window
+    is used for models that don't record theirs.
+    """
+    results = {}
+    for window, names in group_models(models, window):
+        closes = [frames[name]['close'].values.astype(np.float64) for name in names]
+        low, span = min_max_bounds(closes)
+        last = np.stack([c[-window:] for c in closes])
+        windows = (last - low[:, None]) / span[:, None] * 2 - 1
+
+        steps = recursive_forecast(stack_params([models[name] for name in names]), windows, horizon)
+        prices = (steps + 1) / 2 * span[:, None] + low[:, None]
+
+        for name, row in zip(names, prices):
+            df = frames[name]
+            results[name] = {
+                "last_date": str(df['published_date'].iloc[-1])[:10],
+                "last_close": float(df['close'].iloc[-1]),
+                "dates": next_trading_days(df['published_date'], horizon),
+                "predictions": row.tolist(),
+            }
+    return results
@@ -0,0 +1,175 @@
+import gzip
+import json
+import struct
+
+import numpy as np
+
+try:
+    import brotli
+except ImportError:  # Optional, gzip is used without it
+    brotli = None
+
+# Chartable fields and their price store / CSV columns
+FIELDS = {
+    "open": "open",
+    "high": "high",
+    "low": "low",
+    "close": "close",
+    "volume": "traded_quantity",
+    "amount": "traded_amount",
+}
+METHODS = ("lttb", "minmax")
+
+BINARY_MEDIA_TYPE = "application/vnd.stocksense.series"
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+
+def parse_fields(fields):
+    """Comma separated field names to a list, close by default"""
+    names = [name.strip() for name in (fields or "close").split(",") if name.strip()]
+    unknown = [name for name in names if name not in FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields {', '.join(unknown)}, use {', '.join(FIELDS)}")
+    if not names:
+        raise ValueError("At least one field is needed")
+    return list(dict.fromkeys(names))
+
+
+def lttb(x, y, points):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps out of x, y: the
+    first and last point, and from each of points - 2 buckets in between the
+    point forming the largest triangle with the previously kept point and the
+    mean of the next bucket"""
+    n = len(x)
+    if points >= n:
+        return np.arange(n)
+    if points < 3:
+        raise ValueError("LTTB keeps at least 3 points")
+
+    edges = np.linspace(1, n - 1, points - 1).astype(int)
+    # Means of every bucket, the last point standing in for the one after the last bucket
+    counts = np.diff(edges)
+    mean_x = np.append(np.add.reduceat(x[:-1], edges[:-1]) / counts, x[-1])
+    mean_y = np.append(np.add.reduceat(y[:-1], edges[:-1]) / counts, y[-1])
+
+    kept = np.empty(points, dtype=int)
+    kept[0], kept[-1] = 0, n - 1
+    if n / points < 32:
+        # Narrow buckets, as with daily prices, are faster scanned in Python than
+        # through a handful of numpy calls each
+        xs, ys, edges, mean_x, mean_y = x.tolist(), y.tolist(), edges.tolist(), mean_x.tolist(), mean_y.tolist()
+        best = 0
+        for i in range(points - 2):
+            prev_x, prev_y = xs[best], ys[best]
+            dx, dy = prev_x - mean_x[i + 1], mean_y[i + 1] - prev_y
+            best, best_area = edges[i], -1.0
+            for j in range(edges[i], edges[i + 1]):
+                # Twice the triangle area, the factor doesn't change the argmax
+                area = abs(dx * (ys[j] - prev_y) - (prev_x - xs[j]) * dy)
+                if area > best_area:
+                    best, best_area = j, area
+            kept[i + 1] = best
+        return kept
+
+    for i in range(points - 2):
+        lo, hi = edges[i], edges[i + 1]
+        prev_x, prev_y = x[kept[i]], y[kept[i]]
+        areas = np.abs((prev_x - mean_x[i + 1]) * (y[lo:hi] - prev_y) - (prev_x - x[lo:hi]) * (mean_y[i + 1] - prev_y))
+        kept[i + 1] = lo + int(np.argmax(areas))
+    return kept
+
+
+def minmax(y, points):
+    """Indices of the minimum and maximum of each of points // 2 buckets, in order.
+    Keeps every spike, at the cost of a jagged line"""
+    n = len(y)
+    if points >= n:
+        return np.arange(n)
+    buckets = max(points // 2, 1)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    kept = []
+    for lo, hi in zip(edges[:-1], edges[1:]):
+        if hi > lo:
+            kept += sorted({lo + int(np.argmin(y[lo:hi])), lo + int(np.argmax(y[lo:hi]))})
+    return np.array(kept, dtype=int)
+
+
+def price_series(df, fields, points=None, method="lttb"):
+    """Date ordered arrays of the fields of a price frame, downsampled to at most points
+    by the first field. Returns (days since the epoch as int32, {field: float32 array},
+    number of source rows). Rows without a value for the first field are dropped"""
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method {method}, use {' or '.join(METHODS)}")
+    if not df["published_date"].is_monotonic_increasing:
+        df = df.sort_values("published_date", kind="stable")
+    primary = df[FIELDS[fields[0]]].to_numpy(dtype=np.float64)
+    valid = ~np.isnan(primary)
+    days = df["published_date"].to_numpy().astype("datetime64[D]").astype(np.int64)[valid]
+    primary = primary[valid]
+
+    kept = slice(None)
+    if points is not None and points < len(days):
+        kept = lttb(days.astype(np.float64), primary, points) if method == "lttb" else minmax(primary, points)
+
+    values = {field: df[FIELDS[field]].to_numpy(dtype=np.float64)[valid][kept].astype(np.float32) for field in fields}
+    return days[kept].astype(np.int32), values, len(primary)
+
+
+def to_json(series, fields):
+    """Series as {ticker, source_points, points, dates, <field>: [...]} entries, NaN as null"""
+    def floats(values):
+        rounded = values.astype(np.float64).round(6)
+        if not np.isnan(rounded).any():
+            return rounded.tolist()
+        return [None if np.isnan(v) else v for v in rounded.tolist()]
+
+    return {
+        "fields": fields,
+        "series": [
+            {
+                "ticker": ticker,
+                "source_points": source_points,
+                "points": len(days),
+                "dates": np.datetime_as_string(days.astype("datetime64[D]")).tolist(),
+                **{field: floats(values[field]) for field in fields},
+            }
+            for ticker, (days, values, source_points) in series.items()
+        ],
+    }
+
+
+def to_binary(series, fields):
+    """Series as one buffer: a little-endian uint32 header length, the JSON header padded
+    to a multiple of 4 bytes, then per series its dates as int32 days since 1970-01-01
+    followed by one float32 array per field, all little-endian and points long. Every
+    array starts 4 byte aligned, so clients can view them without copying"""
+    header = {
+        "fields": fields,
+        "dates": "int32 days since 1970-01-01",
+        "values": "float32",
+        "series": [
+            {"ticker": ticker, "source_points": source_points, "points": len(days)}
+            for ticker, (days, _, source_points) in series.items()
+        ],
+    }
+    encoded = json.dumps(header).encode()
+    encoded += b" " * (-len(encoded) % 4)
+    parts = [struct.pack("<I", len(encoded)), encoded]
+    for days, values, _ in series.values():
+        parts.append(days.astype("<i4").tobytes())
+        parts += [values[field].astype("<f4").tobytes() for field in fields]
+    return b"".join(parts)
+
+
+def compress(body, accept_encoding):
+    """Returns (body, content encoding or None): brotli when the client accepts it and
+    the module is installed, gzip otherwise when accepted"""
+    if len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    accepted = {part.split(";")[0].strip().lower() for part in (accept_encoding or "").split(",")}
+    if brotli is not None and "br" in accepted:
+        return brotli.compress(body, quality=5), "br"
+    if "gzip" in accepted:
+        return gzip.compress(body, compresslevel=6, mtime=0), "gzip"
+    return body, None
@@ -0,0 +1,105 @@
+import numpy as np
+from sklearn.preprocessing import MinMaxScaler
+
+from models.artifact import load_metadata, load_model
+from models.windowing import make_windows, train_test_split
+
+# Fine-tuning is refused, and the caller retrains from scratch, when new prices reach
+# further than max_drift (a fraction of the stored scaler range) outside that range,
+# or when a loss grows more than max_regression times
+MAX_DRIFT = 0.25
+MAX_REGRESSION = 2.0
+# RMSprop steps are about the learning rate whatever the gradient, so a few full-size
+# steps on a handful of windows undo part of the fit; fine-tuning uses a tenth of it
+LR_SCALE = 0.1
+# Most recent already-seen training windows used to detect forgetting
+GUARD_WINDOWS = 100
+
+
+class FullRetrain(Exception):
+    """Raised with the reason an incremental update is not safe"""
+
+
+def _dates(df):
+    return df["published_date"].astype(str).str[:10].values
+
+
+def training_cutoff(df, window, train_windows):
+    """Date of the last target among the first train_windows windows of df"""
+    return str(_dates(df)[window + train_windows - 1]) if train_windows else None
+
+
+def stored_scaler(metadata):
+    """Rebuilds the MinMaxScaler the model was trained with from its artifact metadata"""
+    bounds = metadata["scaler"]
+    scaler = MinMaxScaler(feature_range=tuple(bounds["feature_range"]))
+    scaler.fit([[bounds["data_min"]], [bounds["data_max"]]])
+    return scaler
+
+
+def price_drift(metadata, prices):
+    """How far prices reach outside the stored scaler range, as a fraction of that range"""
+    low, high = metadata["scaler"]["data_min"], metadata["scaler"]["data_max"]
+    outside = max(float(np.max(prices)) - high, low - float(np.min(prices)), 0.0)
+    return outside / (high - low) if high > low else float("inf")
+
+
+def _mse(model, X, y):
+    if not len(X):
+        return 0.0
+    predictions, _ = model.forward_batch(X)
+    return float(np.mean((predictions - y) ** 2))
+
+
+def fine_tune(model_dir, name, df, window=6, learning_rate=0.0014, hidden_size=30, epochs=3, batch_size=15,
+              train_ratio=0.8, max_drift=MAX_DRIFT, max_regression=MAX_REGRESSION, progress=None, dtype="float64"):
+    """Continues training the saved model, with its optimizer state, on the training
+    windows of df whose target is newer than the model's training cutoff.
+
+    Returns (model, scaler, update) where update records the new cutoff; raises
+    FullRetrain when the saved model can't be reused or the guards trip.
+    """
+    metadata = load_metadata(model_dir, name)
+    saved = (metadata["window"], metadata["hidden_size"], metadata["learning_rate"], metadata.get("dtype", "float64"))
+    if saved != (window, hidden_size, learning_rate, str(np.dtype(dtype))):
+        raise FullRetrain("hyperparameters changed")
+    cutoff = (metadata.get("data") or {}).get("trained_through")
+    if cutoff is None or metadata["scaler"] is None:
+        raise FullRetrain("no training cutoff or scaler recorded")
+
+    prices = df['close'].values.reshape(-1, 1)
+    drift = price_drift(metadata, prices)
+    if drift > max_drift:
+        raise FullRetrain(f"price drift {drift:.2f} > {max_drift}")
+
+    scaler = stored_scaler(metadata)
+    X, y = make_windows(scaler.transform(prices), window)
+    X_train, y_train, _, _ = train_test_split(X, y, train_ratio)
+    targets = _dates(df)[window:window + len(X_train)]
+    new = targets > cutoff
+
+    model = load_model(model_dir, name, mmap=False, with_state=True)
+    update = {"trained_through": cutoff, "new_windows": int(new.sum()), "drift": drift, "epochs_run": 0}
+    if not new.any():
+        return model, scaler, update
+
+    X_new, y_new = X_train[new], y_train[new]
+    X_seen, y_seen = X_train[~new][-GUARD_WINDOWS:], y_train[~new][-GUARD_WINDOWS:]
+    seen_loss = _mse(model, X_seen, y_seen)
+    new_loss = _mse(model, X_new, y_new)
+    if seen_loss > 0 and new_loss > max_regression * seen_loss:
+        raise FullRetrain(f"loss on new windows is {new_loss / seen_loss:.1f}x the recent loss")
+
+    history = list(model.loss_history)
+    model.lr = learning_rate * LR_SCALE
+    model.train(X_new, y_new, epochs=epochs, batch_size=min(batch_size, len(X_new)), progress=progress)
+    model.lr = learning_rate
+    update["epochs_run"] = len(model.loss_history)
+    tuned_loss = _mse(model, X_seen, y_seen)
+    if seen_loss > 0 and tuned_loss > max_regression * seen_loss:
+        raise FullRetrain(f"fine-tuning raised the recent loss {tuned_loss / seen_loss:.1f}x")
+
+    model.loss_history = history + model.loss_history
+    model.save_convergence_plot()
+    update["trained_through"] = str(targets[new][-1])
+    return model, scaler, update
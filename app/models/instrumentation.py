@@ -0,0 +1,149 @@
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+
+# Histogram bucket upper bounds in seconds, finer than usual below 10 ms where
+# cached responses and single forward passes land
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Spans of the request being handled, None outside of one
+_spans = contextvars.ContextVar("spans", default=None)
+
+
+def _labels(names, values):
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for v in values)
+    return "{" + ",".join(f'{n}="{v}"' for n, v in zip(names, escaped)) + "}" if names else ""
+
+
+class Histogram:
+    """Prometheus histogram with one series per combination of label values"""
+
+    def __init__(self, name, help, labels=(), buckets=BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for label_values, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), label_values + (le,))} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labels, label_values)} {total}")
+            lines.append(f"{self.name}_count{_labels(self.labels, label_values)} {count}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = dict(self._values)
+        return metric_lines(self.name, self.help, "counter", [(dict(zip(self.labels, k)), v) for k, v in sorted(values.items())])
+
+
+def metric_lines(name, help, kind, samples):
+    """Exposition lines of a metric from (labels dict, value) samples, for values read at scrape time"""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples:
+        lines.append(f"{name}{_labels(tuple(labels), tuple(labels.values()))} {float(value) if value is not None else 'NaN'}")
+    return lines
+
+
+REQUEST_SECONDS = Histogram("stocksense_request_duration_seconds", "Time to handle a request", ("endpoint", "method"))
+PHASE_SECONDS = Histogram("stocksense_phase_duration_seconds", "Time spent in a named phase of a request", ("endpoint", "phase"))
+REQUESTS = Counter("stocksense_requests_total", "Requests handled", ("endpoint", "method", "status"))
+
+
+@contextmanager
+def span(name):
+    """Times the enclosed block as phase name of the current request. Costs a
+    contextvar lookup outside of requests, e.g. in training worker processes"""
+    spans = _spans.get()
+    if spans is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        spans.append((name, time.perf_counter() - start))
+
+
+def _totals(spans):
+    # Phases that repeat, like per ticker loops, are summed in first-seen order
+    totals = {}
+    for name, seconds in spans:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return totals
+
+
+def server_timing(spans, total):
+    entries = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in _totals(spans).items()]
+    return ", ".join(entries + [f"total;dur={total * 1000:.2f}"])
+
+
+class TimingMiddleware:
+    """ASGI middleware that collects the spans of each request, adds them as a
+    Server-Timing header and records the request and phase durations"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        spans = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                header = server_timing(spans, time.perf_counter() - start).encode()
+                message = {**message, "headers": list(message.get("headers", [])) + [(b"server-timing", header)]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _spans.reset(token)
+            # The route template, so /eda/AHPC and /eda/NABIL are one series
+            route = scope.get("route")
+            endpoint = getattr(route, "path", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, endpoint, scope["method"])
+            REQUESTS.inc(endpoint, scope["method"], status[0])
+            for name, seconds in _totals(spans).items():
+                PHASE_SECONDS.observe(seconds, endpoint, name)
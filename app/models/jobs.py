@@ -0,0 +1,204 @@
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import CancelledError, ProcessPoolExecutor
+from datetime import datetime
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class TrainingCancelled(Exception):
+    pass
+
+
+class ProgressReporter:
+    """Training progress callback used inside a worker process. Publishes the latest
+    event to a dict shared with the server, at most once per interval seconds apart
+    from epoch ends, and stops training once the job is cancelled"""
+
+    def __init__(self, job_id, progress, cancelled, interval=0.25):
+        self.job_id = job_id
+        self.progress = progress
+        self.cancelled = cancelled
+        self.interval = interval
+        self._last_publish = 0.0
+
+    def __call__(self, event):
+        now = time.monotonic()
+        if event["event"] == "batch" and now - self._last_publish < self.interval:
+            return
+        self._last_publish = now
+        self.progress[self.job_id] = event
+        if self.job_id in self.cancelled:
+            raise TrainingCancelled(f"Job {self.job_id} was cancelled")
+
+
+def _run_job(job_id, progress, cancelled, fn, args, kwargs):
+    return fn(*args, progress=ProgressReporter(job_id, progress, cancelled), **kwargs)
+
+
+class JobManager:
+    """Runs training jobs in a process pool of max_workers, with at most max_queued
+    more jobs waiting. Submitting work that is identical to a queued or running job
+    (same key) subscribes to that job instead of starting another one.
+
+    Job functions are called with a progress keyword argument, a callback that
+    makes their latest progress event visible through progress(job_id)."""
+
+    def __init__(self, max_workers=2, max_queued=16, keep_finished=200):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.keep_finished = keep_finished
+        self.jobs = {}
+        self._active_by_key = {}
+        self._executor = None
+        self._manager = None
+        self._progress = None
+        self._cancelled = None
+        self._lock = threading.Lock()
+
+    def _pool(self):
+        if self._executor is None:
+            # Spawned rather than forked, a fork of the threaded server can copy
+            # locks held by other threads and deadlock the worker
+            context = multiprocessing.get_context("spawn")
+            # Progress and cancel flags live in a manager process the workers can reach
+            self._manager = context.Manager()
+            self._progress = self._manager.dict()
+            self._cancelled = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context)
+        return self._executor
+
+    def active_count(self):
+        return len(self._active_by_key)
+
+    def submit(self, key, subscriber, fn, *args, on_success=None, **kwargs):
+        """Returns (job, coalesced). on_success(job, subscriber, result) runs once per
+        subscriber when the job finishes"""
+        with self._lock:
+            job_id = self._active_by_key.get(key)
+            if job_id is not None:
+                job = self.jobs[job_id]
+                if subscriber not in job["subscribers"]:
+                    job["subscribers"].append(subscriber)
+                if subscriber not in job["waiting"]:
+                    job["waiting"].append(subscriber)
+                return job, True
+
+            if len(self._active_by_key) >= self.max_workers + self.max_queued:
+                raise QueueFullError(f"{len(self._active_by_key)} training jobs are already queued or running")
+
+            job = {
+                "id": uuid.uuid4().hex,
+                "key": key,
+                "state": "queued",
+                # Everyone who submitted the job, and those still wanting its result
+                "subscribers": [subscriber],
+                "waiting": [subscriber],
+                "submitted_at": datetime.now().isoformat(timespec="seconds"),
+                "finished_at": None,
+                "error": None,
+                "result": None,
+                "cancel_requested": False,
+                "progress": None,
+            }
+            self.jobs[job["id"]] = job
+            self._active_by_key[key] = job["id"]
+            pool = self._pool()
+            job["future"] = pool.submit(_run_job, job["id"], self._progress, self._cancelled, fn, args, kwargs)
+
+        job["future"].add_done_callback(lambda future: self._finish(job, future, on_success))
+        return job, False
+
+    def _finish(self, job, future, on_success):
+        try:
+            result = future.result()
+            error = None
+        except (CancelledError, TrainingCancelled):
+            result, error = None, None
+        except Exception as e:
+            result, error = None, str(e)
+
+        with self._lock:
+            if self._active_by_key.get(job["key"]) == job["id"]:
+                del self._active_by_key[job["key"]]
+            job["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            job["progress"] = self._forget(job["id"])
+            if future.cancelled() or job["cancel_requested"]:
+                job["state"] = "cancelled"
+            elif error is not None:
+                job["state"], job["error"] = "failed", error
+            else:
+                job["state"], job["result"] = "succeeded", result
+            self._prune()
+
+        if job["state"] == "succeeded" and on_success is not None:
+            for subscriber in list(job["waiting"]):
+                try:
+                    on_success(job, subscriber, result)
+                except Exception as e:
+                    print(f"Storing the result of job {job['id']} failed: {e}")
+
+    def _forget(self, job_id):
+        """Drops the job's shared state and returns its last progress event"""
+        try:
+            self._cancelled.pop(job_id, None)
+            return self._progress.pop(job_id, None)
+        except (OSError, EOFError):
+            # The manager has already been shut down with the server
+            return None
+
+    def _prune(self):
+        finished = sorted((j for j in self.jobs.values() if j["finished_at"] is not None), key=lambda j: j["finished_at"])
+        for job in finished[:max(len(finished) - self.keep_finished, 0)]:
+            del self.jobs[job["id"]]
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def progress(self, job_id):
+        """Latest progress event of the job, None before its first batch"""
+        job = self.jobs[job_id]
+        if job["finished_at"] is not None:
+            return job["progress"]
+        return self._progress.get(job_id)
+
+    def cancel(self, job_id, subscriber):
+        """Drops the subscriber, and cancels the job once nobody is waiting for it.
+        A job that already started stops at its next progress report"""
+        with self._lock:
+            job = self.jobs[job_id]
+            if job["finished_at"] is not None:
+                return job
+            if subscriber in job["waiting"]:
+                job["waiting"].remove(subscriber)
+            if job["waiting"]:
+                return job
+            job["cancel_requested"] = True
+            self._active_by_key.pop(job["key"], None)
+            self._cancelled[job_id] = True
+        job["future"].cancel()
+        return job
+
+    def describe(self, job):
+        state = job["state"]
+        if state == "queued" and job["future"].running():
+            state = "running"
+        if job["cancel_requested"] and job["finished_at"] is None:
+            state = "cancelling"
+        return {
+            "job_id": job["id"],
+            "state": state,
+            "submitted_at": job["submitted_at"],
+            "finished_at": job["finished_at"],
+            "error": job["error"],
+            "progress": self.progress(job["id"]),
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
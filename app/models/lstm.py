@@ -2,10 +2,27 @@ from autograd import numpy as np
 from autograd import grad
 import numpy as N
 import numpy.random as random
+import time
 import matplotlib.pyplot as plt
 
+# Gate blocks are stacked in this order in the fused weight W and bias b
+GATES = ('i', 'f', 'o', 'c')
+
+
+def convert_legacy_params(params):
+    """Stacks the old per-gate arrays (Wi, Wf, Wo, Wc, bi, ...) into the fused W and b layout"""
+    if 'Wi' not in params:
+        return params
+    return {
+        'W': N.vstack([params['W' + gate] for gate in GATES]),
+        'b': N.vstack([params['b' + gate] for gate in GATES]),
+        'Wy': params['Wy'],
+        'by': params['by'],
+    }
+
+
 class LSTM:
-    def __init__(self, input_size=1, hidden_size=50, output_size=1, learning_rate=0.001, beta=0.4):
+    def __init__(self, input_size=1, hidden_size=50, output_size=1, learning_rate=0.001, beta=0.4, dtype="float64"):
         # Parameters
         self.input_size = input_size
         self.hidden_size = hidden_size
@@ -14,114 +31,190 @@ class LSTM:
         # self.momentum=momentum
         self.beta= beta
         self.max_grad_norm = 10.0
+        # Weights, optimizer state, activations and inputs all use this dtype
+        self.dtype = N.dtype(dtype)
         
         # self.m = {}  # First moment estimates
         # self.v = {}  # Second moment estimates
         self.t = 0
         random.seed(42)
         
-        # Gates weights (input, forget, output, cell)
-        self.Wi = random.randn(hidden_size, input_size + hidden_size)
-        self.Wf = random.randn(hidden_size, input_size + hidden_size)
-        self.Wo = random.randn(hidden_size, input_size + hidden_size)
-        self.Wc = random.randn(hidden_size, input_size + hidden_size)
+        # Gates weights (input, forget, output, cell) stacked into one (4*hidden, input+hidden) matrix
+        self.W = random.randn(4 * hidden_size, input_size + hidden_size).astype(self.dtype)
         
         # Output weights
-        self.Wy = random.randn(output_size, hidden_size)
+        self.Wy = random.randn(output_size, hidden_size).astype(self.dtype)
         
         # Biases
-        self.bi = np.zeros((hidden_size, 1))
-        self.bf = np.zeros((hidden_size, 1))
-        self.bo = np.zeros((hidden_size, 1))
-        self.bc = np.zeros((hidden_size, 1))
-        self.by = np.zeros((output_size, 1))
+        self.b = np.zeros((4 * hidden_size, 1), dtype=self.dtype)
+        self.by = np.zeros((output_size, 1), dtype=self.dtype)
         
         # Dictionary for storing parameters for easier updates
-        self.params = {
-            'Wi': self.Wi, 'Wf': self.Wf, 'Wo': self.Wo, 'Wc': self.Wc, 'Wy': self.Wy,
-            'bi': self.bi, 'bf': self.bf, 'bo': self.bo, 'bc': self.bc, 'by': self.by
-        }
-        self.velocity={
-            'Wi': N.zeros_like(self.Wi), 'Wf': N.zeros_like(self.Wf), 'Wo': N.zeros_like(self.Wo), 'Wc': N.zeros_like(self.Wc), 'Wy': N.zeros_like(self.Wy),
-            'bi': N.zeros_like(self.bi), 'bf': N.zeros_like(self.bf), 'bo': N.zeros_like(self.bo), 'bc': N.zeros_like(self.bc), 'by': N.zeros_like(self.by)
-        }
+        self.params = {'W': self.W, 'b': self.b, 'Wy': self.Wy, 'by': self.by}
+        self.velocity = {name: N.zeros_like(value) for name, value in self.params.items()}
+
+    def __setstate__(self, state):
+        # Models pickled before the fused gate layout carry separate Wi/Wf/Wo/Wc arrays
+        if 'Wi' in state['params']:
+            state['params'] = convert_legacy_params(state['params'])
+            state['velocity'] = convert_legacy_params(state['velocity'])
+            for name in ('Wi', 'Wf', 'Wo', 'Wc', 'bi', 'bf', 'bo', 'bc'):
+                state.pop(name, None)
+            state.update(state['params'])
+        # Pickles from before the dtype option are float64
+        state.setdefault('dtype', N.dtype('float64'))
+        self.__dict__.update(state)
         
+    def astype(self, dtype):
+        """Copy of the model with weights and optimizer state cast to dtype"""
+        model = LSTM(self.input_size, self.hidden_size, self.output_size, self.lr, self.beta, dtype=dtype)
+        model.max_grad_norm = self.max_grad_norm
+        model.params = {name: N.array(value, dtype=model.dtype) for name, value in self.params.items()}
+        model.velocity = {name: N.array(value, dtype=model.dtype) for name, value in self.velocity.items()}
+        for name, value in model.params.items():
+            setattr(model, name, value)
+        model.loss_history = list(getattr(self, 'loss_history', []))
+        return model
+
     def sigmoid(self, x):
         return 1 / (1 + np.exp(-x))
     
     def forward_pass(self,params, x_sequence):
-            
-        h_prev = np.zeros((self.hidden_size, 1))
-        c_prev = np.zeros((self.hidden_size, 1))
-                
-        for x in x_sequence:
-                x = x.reshape(-1, 1)
-                combined = np.vstack((x, h_prev))
-                
-                # Forget gate
-                f = self.sigmoid(np.dot(params['Wf'], combined) + params['bf'])
-                # Input gate
-                i = self.sigmoid(np.dot(params['Wi'], combined) + params['bi'])
-                # Output gate
-                o = self.sigmoid(np.dot(params['Wo'], combined) + params['bo'])
-                # Cell state
-                c_candidate = np.tanh(np.dot(params['Wc'], combined) + params['bc'])
-                c_prev = f * c_prev + i * c_candidate
-                # Hidden state
-                h_prev = o * np.tanh(c_prev)
-            
-                # Output layer
+        return self.forward_pass_batch(params, N.reshape(x_sequence, (1, -1, self.input_size)))
+    
+    def forward_pass_batch(self, params, X_SEQ, cache=None):
+        # Hidden and cell state are kept as (hidden, batch) matrices so every
+        # timestep is a single matmul over the whole batch.
+        # When a cache list is given, each timestep's activations are appended
+        # to it for backward_pass
+        H = self.hidden_size
+        X_SEQ = N.asarray(X_SEQ, dtype=self.dtype).reshape(len(X_SEQ), -1, self.input_size)
+        h_prev = np.zeros((H, len(X_SEQ)), dtype=self.dtype)
+        c_prev = np.zeros((H, len(X_SEQ)), dtype=self.dtype)
+
+        # Input-to-hidden products for every timestep in one GEMM, shape (timesteps, 4*hidden, batch)
+        W_x = params['W'][:, :self.input_size]
+        W_h = params['W'][:, self.input_size:]
+        x_proj = np.matmul(W_x, N.transpose(X_SEQ, (1, 2, 0))) + params['b']
+
+        for t in range(X_SEQ.shape[1]):
+            z = x_proj[t] + np.dot(W_h, h_prev)
+
+            # Input, forget and output gates
+            gates = self.sigmoid(z[:3 * H])
+            i, f, o = gates[:H], gates[H:2 * H], gates[2 * H:]
+            # Cell state
+            c_candidate = np.tanh(z[3 * H:])
+            c_old = c_prev
+            c_prev = f * c_prev + i * c_candidate
+            # Hidden state
+            tanh_c = np.tanh(c_prev)
+            h_old = h_prev
+            h_prev = o * tanh_c
+
+            if cache is not None:
+                cache.append((h_old, i, f, o, c_candidate, c_old, tanh_c))
+
+        # Output layer
         y = np.dot(params['Wy'], h_prev) + params['by']
         return y, h_prev
-    
 
-    
     def forward_passB(self, params, X_SEQ):
-        
-        def forward(params, x_sequence):
-        
-            h_prev = np.zeros((self.hidden_size, 1))
-            c_prev = np.zeros((self.hidden_size, 1))
-            
-            for x in x_sequence:
-                x = x.reshape(-1, 1)
-                combined = np.vstack((x, h_prev))
-                
-                # Forget gate
-                f = self.sigmoid(np.dot(params['Wf'], combined) + params['bf'])
-                # Input gate
-                i = self.sigmoid(np.dot(params['Wi'], combined) + params['bi'])
-                # Output gate
-                o = self.sigmoid(np.dot(params['Wo'], combined) + params['bo'])
-                # Cell state
-                c_candidate = np.tanh(np.dot(params['Wc'], combined) + params['bc'])
-                c_prev = f * c_prev + i * c_candidate
-                # Hidden state
-                h_prev = o * np.tanh(c_prev)
-            
-            # Output layer
-            y = np.dot(params['Wy'], h_prev) + params['by']
-            return y, h_prev
-    
-        Y_SEQ=[]
-        for x in X_SEQ:
-            temp_y ,_ =forward(params,x)
-            Y_SEQ.append( temp_y )
-    
-        Y_SEQ = np.array(Y_SEQ)
-        return Y_SEQ
+        y, _ = self.forward_pass_batch(params, X_SEQ)
+        # Same (batch, output, 1) layout as stacking forward_pass results
+        return np.reshape(y.T, (-1, self.output_size, 1))
     
     def loss_function(self, params, x_sequence, y_true):
             y_pred= self.forward_passB(params, x_sequence)
             loss = np.mean((y_pred - y_true)**2) 
             # print(loss)
             return loss
+
+    def backward_pass(self, params, X_SEQ, cache, h_last, dy):
+        """Backpropagation through time over the activations cached by forward_pass_batch.
+        dy is the loss gradient w.r.t. the (output, batch) predictions"""
+        H = self.hidden_size
+        X_SEQ = N.asarray(X_SEQ, dtype=self.dtype).reshape(len(X_SEQ), -1, self.input_size)
+        W_h = params['W'][:, self.input_size:]
+
+        grads = {name: N.zeros_like(value) for name, value in params.items()}
+        grads['Wy'] = N.dot(dy, h_last.T)
+        grads['by'] = N.sum(dy, axis=1, keepdims=True)
+
+        # Gradients w.r.t. the stacked gate pre-activations, shape (timesteps, 4*hidden, batch)
+        dz = N.empty((len(cache), 4 * H, len(X_SEQ)), dtype=self.dtype)
+        dh = N.dot(params['Wy'].T, dy)
+        dc = N.zeros_like(dh)
+        for t in range(len(cache) - 1, -1, -1):
+            h_old, i, f, o, c_candidate, c_old, tanh_c = cache[t]
+            dc = dc + dh * o * (1 - tanh_c ** 2)
+            dz[t, :H] = dc * c_candidate * i * (1 - i)
+            dz[t, H:2 * H] = dc * c_old * f * (1 - f)
+            dz[t, 2 * H:3 * H] = dh * tanh_c * o * (1 - o)
+            dz[t, 3 * H:] = dc * i * (1 - c_candidate ** 2)
+
+            grads['W'][:, self.input_size:] += N.dot(dz[t], h_old.T)
+            dh = N.dot(W_h.T, dz[t])
+            dc = dc * f
+
+        # Input-to-hidden and bias gradients for every timestep at once
+        grads['W'][:, :self.input_size] = N.tensordot(dz, N.transpose(X_SEQ, (1, 2, 0)), axes=([0, 2], [0, 2]))
+        grads['b'] = N.sum(dz, axis=(0, 2)).reshape(-1, 1)
+        return grads
+
+    def loss_and_gradients(self, params, x_sequence, y_true):
+        """Same loss as loss_function, with its gradients computed by backward_pass instead of autograd"""
+        cache = []
+        y, h_last = self.forward_pass_batch(params, N.asarray(x_sequence), cache)
+        y_pred = N.reshape(y.T, (-1, self.output_size, 1))
+        diff = y_pred - N.asarray(y_true, dtype=self.dtype)
+        loss = N.mean(diff ** 2)
+
+        # y_true broadcasts against y_pred, so sum the gradient back to y_pred's shape
+        dy_pred = 2 * diff / diff.size
+        while dy_pred.ndim > y_pred.ndim:
+            dy_pred = dy_pred.sum(axis=0)
+        for axis, size in enumerate(y_pred.shape):
+            if size == 1 and dy_pred.shape[axis] != 1:
+                dy_pred = dy_pred.sum(axis=axis, keepdims=True)
+
+        dy = dy_pred.reshape(-1, self.output_size).T
+        return loss, self.backward_pass(params, N.asarray(x_sequence), cache, h_last, dy)
+
+    def check_gradients(self, x_sequence, y_true):
+        """Largest absolute difference per parameter between the BPTT and autograd gradients"""
+        _, bptt_grads = self.loss_and_gradients(self.params, x_sequence, y_true)
+        autograd_grads = grad(self.loss_function, argnum=0)(self.params, x_sequence, y_true)
+        return {name: float(N.max(N.abs(bptt_grads[name] - autograd_grads[name]))) for name in self.params}
     
-    def train(self, X, y, epochs, batch_size=15):
+    def train(self, X, y, epochs, batch_size=15, gradient_mode="bptt", progress=None, plot=True,
+              validation_split=0.0, patience=None, min_delta=0.0, restore_best=True):
+        # gradient_mode="autograd" keeps the original autograd tracing as a reference
+        # progress, if given, is called with a dict after every batch ("batch") and
+        # epoch ("epoch"); raising from it stops training
+        # plot=False skips rendering the convergence plot, for runs continued in steps
+        # validation_split holds out the last share of the windows and tracks their MSE
+        # per epoch; training stops once it hasn't improved by more than min_delta for
+        # patience epochs, and restore_best rolls the weights back to the best epoch
         grad_loss = grad(self.loss_function, argnum=0)
         BATCHSIZE = batch_size
         gradients = 0
         self.loss_history = []  # Reset loss history
+        self.val_loss_history = []
+        self.best_epoch = None
+        # Cast the windows once instead of per batch, a no-op for matching dtypes
+        X = N.asarray(X, dtype=self.dtype)
+        y = N.asarray(y, dtype=self.dtype)
+
+        # The windows are in time order, so validate on the most recent ones
+        n_val = int(len(X) * validation_split)
+        if n_val:
+            X, X_val, y, y_val = X[:-n_val], X[-n_val:], y[:-n_val], y[-n_val:]
+        best_loss, best_state, waited = N.inf, None, 0
+
+        batches = int(len(X) / BATCHSIZE)
+        started = time.perf_counter()
+        done = 0
 
         for epoch in range(epochs):
             total_loss = 0
@@ -131,12 +224,15 @@ class LSTM:
                 x_seq = X[offset:offset + stride, :]
                 y_true = y[offset:offset + stride, :]
 
-                # Compute loss
-                loss = self.loss_function(self.params, x_seq, y_true)
-                total_loss += loss
+                if gradient_mode == "autograd":
+                    # Compute loss
+                    loss = self.loss_function(self.params, x_seq, y_true)
 
-                # Compute gradients using autograd
-                gradients = grad_loss(self.params, x_seq, y_true)
+                    # Compute gradients using autograd
+                    gradients = grad_loss(self.params, x_seq, y_true)
+                else:
+                    loss, gradients = self.loss_and_gradients(self.params, x_seq, y_true)
+                total_loss += loss
 
                 # Update parameters
                 for param_name in self.params:
@@ -145,21 +241,67 @@ class LSTM:
                     self.velocity[param_name] = self.beta * self.velocity[param_name] + (1 - self.beta) * N.array(gradients[param_name]) ** 2
                     self.params[param_name] -= (self.lr / (1e-8 + N.sqrt(self.velocity[param_name]))) * gradients[param_name]
 
+                done += 1
+                if progress is not None:
+                    progress(self._progress_event("batch", epoch, epochs, i + 1, batches, done, started, loss=float(loss)))
+
             avg_loss = total_loss / (len(X) / BATCHSIZE)
             self.loss_history.append(avg_loss)  # Store the average loss for the epoch
 
             print(f"Epoch {epoch + 1}/{epochs}, Loss: {avg_loss:.4f}")
 
             grad_norm = sum(N.linalg.norm(grad) for grad in gradients.values())
+            values = {"loss": float(avg_loss), "grad_norm": float(grad_norm)}
+            if n_val:
+                val_pred, _ = self.forward_batch(X_val)
+                val_loss = float(N.mean((val_pred - y_val) ** 2))
+                self.val_loss_history.append(val_loss)
+                values["val_loss"] = val_loss
+                if val_loss < best_loss - min_delta:
+                    best_loss, waited, self.best_epoch = val_loss, 0, epoch + 1
+                    if restore_best:
+                        best_state = ({name: value.copy() for name, value in self.params.items()},
+                                      {name: value.copy() for name, value in self.velocity.items()})
+                else:
+                    waited += 1
+            if progress is not None:
+                progress(self._progress_event("epoch", epoch, epochs, batches, batches, done, started, **values))
             if grad_norm < 1e-4:
                 print(f"Gradient norm {grad_norm:.6f} too small, stopping training.")
                 break
+            if patience is not None and waited >= patience:
+                print(f"Validation loss hasn't improved for {waited} epochs, stopping training.")
+                break
+
+        if best_state is not None and self.best_epoch < len(self.loss_history):
+            # In place, self.W and friends are the same arrays as self.params
+            for name, value in best_state[0].items():
+                self.params[name][...] = value
+            for name, value in best_state[1].items():
+                self.velocity[name][...] = value
 
         # Create convergence plot and store it in the model
-        self.save_convergence_plot()
+        if plot:
+            self.save_convergence_plot()
         
         return self.loss_history
     
+    @staticmethod
+    def _progress_event(event, epoch, epochs, batch, batches, done, started, **values):
+        elapsed = time.perf_counter() - started
+        rate = done / elapsed if elapsed > 0 else None
+        remaining = epochs * batches - done
+        return {
+            "event": event,
+            "epoch": epoch + 1,
+            "epochs": epochs,
+            "batch": batch,
+            "batches": batches,
+            **values,
+            "batches_per_sec": rate,
+            "eta_seconds": remaining / rate if rate else None,
+        }
+
     def save_convergence_plot(self):
         """Creates and stores the convergence plot in the model"""
         import io
@@ -190,4 +332,9 @@ class LSTM:
         return self.convergence_plot_data
     
     def forward(self, x_sequence):
-        return self.forward_pass(self.params, x_sequence)
\ No newline at end of file
+        return self.forward_pass(self.params, x_sequence)
+
+    def forward_batch(self, X_sequences):
+        """Runs a whole batch of sequences at once, returns (batch, output) predictions and (batch, hidden) states"""
+        y, h = self.forward_pass_batch(self.params, N.asarray(X_sequences))
+        return y.T, h.T
\ No newline at end of file
@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+import pandas as pd
+
+from models.price_store import get_store
+
+CSV_DIR = "./stock_data_csv"
+
+
+class TickerManifest:
+    """In-memory listing of the tickers in stock_data_csv with their sector, row count
+    and date span. Only files whose mtime or size changed are parsed again on refresh"""
+
+    def __init__(self, csv_dir=CSV_DIR, refresh_interval=2.0):
+        self.csv_dir = csv_dir
+        # Directory scans closer together than this reuse the previous result
+        self.refresh_interval = refresh_interval
+        self.entries = {}
+        self.etag = None
+        self._last_refresh = 0.0
+        self._lock = threading.Lock()
+
+    def _describe(self, ticker, path, stat):
+        store = get_store()
+        if store is not None and ticker in store and store.is_fresh(ticker, path):
+            entry = store.tickers[ticker]
+            first = entry["offset"]
+            dates = store.columns["published_date"][first:first + entry["length"]]
+            sector, rows = entry["category"], entry["length"]
+        else:
+            df = pd.read_csv(path, usecols=["published_date", "Category"])
+            dates = pd.to_datetime(df["published_date"]).values.astype("datetime64[D]")
+            sector, rows = (df["Category"][0] if len(df) else None), len(df)
+
+        return {
+            "ticker": ticker,
+            "sector": sector,
+            "rows": int(rows),
+            "first_date": str(dates.min()) if rows else None,
+            "last_date": str(dates.max()) if rows else None,
+            "mtime": stat.st_mtime,
+            "size": stat.st_size,
+        }
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and time.monotonic() - self._last_refresh < self.refresh_interval:
+                return self.entries
+
+            entries = {}
+            for csv in os.listdir(self.csv_dir):
+                ticker, ext = os.path.splitext(csv)
+                if ext != ".csv":
+                    continue
+                path = os.path.join(self.csv_dir, csv)
+                stat = os.stat(path)
+                entry = self.entries.get(ticker)
+                if entry is None or (entry["mtime"], entry["size"]) != (stat.st_mtime, stat.st_size):
+                    entry = self._describe(ticker, path, stat)
+                entries[ticker] = entry
+
+            if entries != self.entries or self.etag is None:
+                payload = json.dumps([entries[t] for t in sorted(entries)], sort_keys=True)
+                self.etag = '"' + hashlib.sha1(payload.encode()).hexdigest() + '"'
+                self.entries = entries
+            self._last_refresh = time.monotonic()
+            return self.entries
+
+    def tickers(self):
+        entries = self.refresh()
+        return [entries[t] for t in sorted(entries)]
+
+    def sectors(self):
+        """Sector name to its sorted tickers"""
+        sectors = {}
+        for entry in self.tickers():
+            sectors.setdefault(entry["sector"], []).append(entry["ticker"])
+        return sectors
+
+    def has_ticker(self, ticker):
+        # A file added since the last scan is found by the next scheduled one, misses
+        # don't force a rescan so unknown tickers can't make every request list the folder
+        return ticker in self.refresh()
+
+    def resolve_sector(self, sector):
+        """The manifest's spelling of a sector name matched case-insensitively, None if
+        there is no such sector. Look sectors up by this name only"""
+        wanted = sector.strip().lower()
+        return next((name for name in self.sectors() if str(name).lower() == wanted), None)
@@ -0,0 +1,69 @@
+from sklearn.preprocessing import MinMaxScaler
+from models.artifact import has_artifact
+from models.incremental import FullRetrain, fine_tune
+from models.instrumentation import span
+from models.lstm import LSTM
+from models.stock import get_stock_data
+from models.utils import mse, rmse, mape
+from models.windowing import make_windows, train_test_split
+
+
+def train_and_evaluate(ticker, window_size=6, learning_rate=0.0014, epochs=15, batch_size=15, progress=None,
+                       incremental=False, model_dir="SavedModel", fine_tune_epochs=3, early_stopping=False,
+                       patience=3, min_delta=0.0, validation_split=0.1):
+    """Trains a fresh LSTM on the first 80% of the last 1000 closes and scores it on the rest.
+    With incremental the ticker's saved model is fine-tuned on its new windows instead,
+    when the hyperparameters match and the guards allow it. With early_stopping the
+    last validation_split of the training windows is held out, training stops after
+    patience epochs without improvement and the best epoch's weights are kept.
+    Module-level so it can run in a worker process"""
+    with span("read_data"):
+        df = get_stock_data(ticker, tail=1000)
+    training = {"mode": "full", "reason": None, "epochs_run": None, "best_epoch": None}
+
+    if incremental:
+        try:
+            if not has_artifact(model_dir, ticker):
+                raise FullRetrain("no saved model")
+            with span("train"):
+                model, scaler, update = fine_tune(model_dir, ticker, df, window=window_size, learning_rate=learning_rate,
+                                                  epochs=fine_tune_epochs, batch_size=batch_size, progress=progress)
+            training.update(mode="fine-tuned", reason=f"{update['new_windows']} new windows", epochs_run=update["epochs_run"])
+        except FullRetrain as e:
+            training["reason"] = str(e)
+
+    prices = df['close'].values.reshape(-1, 1)
+
+    if training["mode"] == "full":
+        model = LSTM(input_size=1, hidden_size=30, output_size=1, learning_rate=learning_rate)
+        # Normalize, with a scaler of its own so concurrent runs don't share state
+        scaler = MinMaxScaler(feature_range=(-1, 1))
+        scaler.fit(prices)
+
+    # Create sequences
+    with span("windows"):
+        X, y = make_windows(scaler.transform(prices), window_size)
+        X_train, y_train, X_test, y_test = train_test_split(X, y)
+
+    # Train model
+    if training["mode"] == "full":
+        stopping = {"validation_split": validation_split, "patience": patience, "min_delta": min_delta} if early_stopping else {}
+        with span("train"):
+            model.train(X_train, y_train, epochs=epochs, batch_size=batch_size, progress=progress, **stopping)
+        training["epochs_run"] = len(model.loss_history)
+        training["best_epoch"] = model.best_epoch
+
+    # Test
+    with span("forward"):
+        y_pred, _ = model.forward_batch(X_test)
+
+    # Inverse transform
+    predictions = scaler.inverse_transform(y_pred[:, 0].reshape(-1, 1))
+    actual = scaler.inverse_transform(y_test.reshape(-1, 1))
+
+    return {
+        "predictions": predictions.flatten().tolist(),
+        "actual": actual.flatten().tolist(),
+        "training": training,
+        "metrics": {"MSE": float(mse(actual, predictions)), "RMSE": float(rmse(actual, predictions)), "MAPE": float(mape(actual, predictions))},
+    }
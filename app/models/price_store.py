@@ -0,0 +1,201 @@
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+STORE_DIR = "./price_store"
+CSV_DIR = "./stock_data_csv"
+
+# Columns kept in the store, in CSV order, and the dtype of their binary arrays.
+# With the per ticker Category they make up every CSV column, so reads from the
+# store and from the CSV return the same frame
+PRICE_COLUMNS = {
+    "published_date": "datetime64[D]",
+    "open": "float64",
+    "high": "float64",
+    "low": "float64",
+    "close": "float64",
+    "per_change": "float64",
+    "traded_quantity": "float64",
+    "traded_amount": "float64",
+    "status": "int64",
+}
+
+# Rows are stored in file order and some CSVs repeat a few days, so the dates
+# are not strictly sorted. These monotonic bounds (running max and suffix min
+# of the dates) let a date range be found by binary search anyway.
+DATE_UPPER = "date_upper"
+DATE_LOWER = "date_lower"
+
+
+def date_bounds(dates):
+    upper = np.maximum.accumulate(dates)
+    lower = np.minimum.accumulate(dates[::-1])[::-1]
+    return upper, lower
+
+
+def select_rows(dates, upper, lower, tail=None, start=None, end=None):
+    """Returns (lo, hi, mask) so rows lo:hi filtered by mask (None for all) match the query.
+    Only the dates inside lo:hi are read"""
+    lo, hi = 0, len(dates)
+    if start is not None:
+        lo = int(np.searchsorted(upper, np.datetime64(start, "D"), side="left"))
+    if end is not None:
+        hi = int(np.searchsorted(lower, np.datetime64(end, "D"), side="right"))
+    hi = max(lo, hi)
+
+    mask = None
+    if start is not None or end is not None:
+        window = dates[lo:hi]
+        mask = np.ones(len(window), dtype=bool)
+        if start is not None:
+            mask &= window >= np.datetime64(start, "D")
+        if end is not None:
+            mask &= window <= np.datetime64(end, "D")
+        if mask.all():
+            mask = None
+
+    if tail is not None:
+        if mask is None:
+            lo = max(lo, hi - tail)
+        else:
+            # Keep the last `tail` matching rows
+            keep = np.flatnonzero(mask)
+            keep = keep[max(0, len(keep) - tail):]
+            first = int(keep[0]) if len(keep) else len(mask)
+            lo, mask = lo + first, mask[first:]
+    return lo, hi, mask
+
+
+def _source_stat(path):
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+def build_store(csv_dir=CSV_DIR, store_dir=STORE_DIR):
+    """Converts every CSV in csv_dir into one binary array per column plus a ticker index"""
+    os.makedirs(store_dir, exist_ok=True)
+
+    columns = {name: [] for name in PRICE_COLUMNS}
+    columns[DATE_UPPER] = []
+    columns[DATE_LOWER] = []
+    tickers = {}
+    offset = 0
+
+    for csv in sorted(os.listdir(csv_dir)):
+        ticker, ext = os.path.splitext(csv)
+        if ext != ".csv":
+            continue
+        path = os.path.join(csv_dir, csv)
+        mtime_ns, size = _source_stat(path)
+        df = pd.read_csv(path)
+
+        for name, dtype in PRICE_COLUMNS.items():
+            if name == "published_date":
+                values = pd.to_datetime(df[name]).values.astype(dtype)
+            else:
+                values = df[name].to_numpy(dtype=dtype)
+            columns[name].append(values)
+        upper, lower = date_bounds(columns["published_date"][-1])
+        columns[DATE_UPPER].append(upper)
+        columns[DATE_LOWER].append(lower)
+
+        tickers[ticker] = {
+            "offset": offset,
+            "length": len(df),
+            "category": df["Category"][0] if "Category" in df.columns and len(df) else None,
+            "source_mtime_ns": mtime_ns,
+            "source_size": size,
+        }
+        offset += len(df)
+
+    # Arrays go into a fresh data directory and the index is swapped in last,
+    # so readers never mix columns from two builds
+    data_dir = f"data-{time.time_ns()}"
+    os.makedirs(os.path.join(store_dir, data_dir))
+    for name, parts in columns.items():
+        dtype = PRICE_COLUMNS.get(name, "datetime64[D]")
+        values = np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+        np.save(os.path.join(store_dir, data_dir, f"{name}.npy"), values)
+
+    index_path = os.path.join(store_dir, "index.json")
+    with open(index_path + ".tmp", "w") as f:
+        json.dump({"columns": PRICE_COLUMNS, "data_dir": data_dir, "rows": offset, "tickers": tickers}, f)
+    os.replace(index_path + ".tmp", index_path)
+
+    # Open memory maps keep the old files readable after they are unlinked
+    for entry in os.listdir(store_dir):
+        if entry.startswith("data-") and entry != data_dir:
+            shutil.rmtree(os.path.join(store_dir, entry), ignore_errors=True)
+
+    return tickers
+
+
+class PriceStore:
+    """Read-only view over a store written by build_store. Columns are memory-mapped,
+    so several worker processes share the same pages through the OS page cache"""
+
+    def __init__(self, store_dir=STORE_DIR):
+        self.store_dir = store_dir
+        with open(os.path.join(store_dir, "index.json")) as f:
+            index = json.load(f)
+        self.tickers = index["tickers"]
+        # Stores built before a column was added serve nothing until they are rebuilt
+        self.complete = list(index["columns"]) == list(PRICE_COLUMNS)
+        self.columns = {
+            name: np.load(os.path.join(store_dir, index["data_dir"], f"{name}.npy"), mmap_mode="r")
+            for name in list(index["columns"]) + [DATE_UPPER, DATE_LOWER]
+        }
+
+    def __contains__(self, ticker):
+        return ticker in self.tickers
+
+    def is_fresh(self, ticker, csv_path):
+        """False once the source CSV was modified after the store was built"""
+        if not self.complete:
+            return False
+        entry = self.tickers[ticker]
+        return _source_stat(csv_path) == (entry["source_mtime_ns"], entry["source_size"])
+
+    def read(self, ticker, tail=None, start=None, end=None):
+        entry = self.tickers[ticker]
+        first, last = entry["offset"], entry["offset"] + entry["length"]
+
+        lo, hi, mask = select_rows(
+            self.columns["published_date"][first:last],
+            self.columns[DATE_UPPER][first:last],
+            self.columns[DATE_LOWER][first:last],
+            tail=tail, start=start, end=end,
+        )
+
+        data = {}
+        for name in PRICE_COLUMNS:
+            values = np.array(self.columns[name][first + lo:first + hi])
+            data[name] = values if mask is None else values[mask]
+        data["published_date"] = data["published_date"].astype("datetime64[ns]")
+        data["Category"] = entry["category"]
+        return pd.DataFrame(data)
+
+
+_store = None
+_store_version = None
+_store_lock = threading.Lock()
+
+
+def get_store(store_dir=STORE_DIR):
+    """Shared PriceStore, reopened when the store is rebuilt. None if no store was built"""
+    global _store, _store_version
+    try:
+        version = os.stat(os.path.join(store_dir, "index.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+    with _store_lock:
+        if _store is None or _store_version != (store_dir, version):
+            _store = PriceStore(store_dir)
+            _store_version = (store_dir, version)
+        return _store
@@ -0,0 +1,118 @@
+import json
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+import joblib
+
+from models import artifact
+
+MODEL_DIR = "SavedModel"
+
+
+class ModelRegistry:
+    """Bounded LRU of deserialized models keyed by ticker or sector name.
+
+    Models saved in the artifact format are preferred over legacy pickles.
+    A cached model is reused until its file's mtime or size changes, so a
+    retrained model is picked up without restarting the server. The file is
+    stat'ed at most once per check_interval seconds per model.
+    """
+
+    def __init__(self, model_dir=MODEL_DIR, capacity=32, check_interval=1.0):
+        self.model_dir = model_dir
+        self.capacity = capacity
+        self.check_interval = check_interval
+        self._models = OrderedDict()  # name -> [file signature, last check time, model]
+        self._lock = threading.Lock()
+        self.popularity = Counter()
+        self.stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+    def path(self, name):
+        return os.path.join(self.model_dir, f"{name}.pkl")
+
+    def signature(self, name):
+        # The artifact metadata is replaced last when a model is saved
+        try:
+            stat = os.stat(artifact.metadata_path(self.model_dir, name))
+        except FileNotFoundError:
+            stat = os.stat(self.path(name))
+        return stat.st_mtime_ns, stat.st_size
+
+    def load(self, name):
+        if artifact.has_artifact(self.model_dir, name):
+            return artifact.load_model(self.model_dir, name)
+        return joblib.load(self.path(name))
+
+    def get(self, name):
+        model = self._lookup(name)
+        with self._lock:
+            self.popularity[name] += 1
+        return model
+
+    def _lookup(self, name):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and now - entry[1] < self.check_interval:
+                self._models.move_to_end(name)
+                self.stats["hits"] += 1
+                return entry[2]
+
+        # Raises FileNotFoundError for unknown names, like joblib.load did
+        signature = self.signature(name)
+        with self._lock:
+            entry = self._models.get(name)
+            if entry is not None and entry[0] == signature:
+                entry[1] = now
+                self._models.move_to_end(name)
+                self.stats["hits"] += 1
+                return entry[2]
+
+        model = self.load(name)
+        with self._lock:
+            self.stats["reloads" if name in self._models else "misses"] += 1
+            self._models[name] = [signature, now, model]
+            self._models.move_to_end(name)
+            while len(self._models) > self.capacity:
+                self._models.popitem(last=False)
+                self.stats["evictions"] += 1
+        return model
+
+    def preload(self, names):
+        loaded = []
+        for name in names[:self.capacity]:
+            try:
+                self._lookup(name)
+                loaded.append(name)
+            except FileNotFoundError:
+                print(f"Skipping preload of {name}, no saved model found")
+        return loaded
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"] + self.stats["reloads"]
+            return {
+                **self.stats,
+                "hit_rate": self.stats["hits"] / lookups if lookups else None,
+                "capacity": self.capacity,
+                "size": len(self._models),
+                "cached": list(self._models),
+            }
+
+    # Request counts are kept across restarts so the hottest models can be preloaded
+    def save_popularity(self, path):
+        with self._lock:
+            counts = dict(self.popularity)
+        with open(path + ".tmp", "w") as f:
+            json.dump(counts, f)
+        os.replace(path + ".tmp", path)
+
+    def load_popularity(self, path):
+        try:
+            with open(path) as f:
+                self.popularity.update(json.load(f))
+        except FileNotFoundError:
+            pass
+        return [name for name, _ in self.popularity.most_common()]
@@ -0,0 +1,152 @@
+import glob
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+
+
+def file_signature(path):
+    """Changes whenever the file is rewritten, used to key results on their inputs"""
+    stat = os.stat(path)
+    return stat.st_mtime_ns, stat.st_size
+
+
+class ResultCache:
+    """Response cache for deterministic endpoints, an in-memory LRU with an optional
+    on-disk tier of JSON files that survives restarts.
+
+    Keys are built from the model and data file signatures, so retraining a
+    model or appending price rows makes the old entries unreachable.
+    """
+
+    def __init__(self, capacity=256, disk_dir=None):
+        self.capacity = capacity
+        self.disk_dir = disk_dir
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "disk_hits": 0, "misses": 0, "disk_errors": 0}
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def key(self, kind, name, *inputs):
+        """Put request parameters that select a result, rather than a version of it, in
+        name: a put deletes the disk entries of the same kind and name"""
+        digest = hashlib.sha1(json.dumps(inputs, default=str).encode()).hexdigest()[:16]
+        return f"{kind}-{name}-{digest}"
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, key + ".json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._entries[key]
+
+        if self.disk_dir:
+            try:
+                with open(self._disk_path(key)) as f:
+                    value = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                value = None
+            if value is not None:
+                self._remember(key, value)
+                with self._lock:
+                    self.stats["disk_hits"] += 1
+                return value
+
+        with self._lock:
+            self.stats["misses"] += 1
+        return None
+
+    def put(self, key, value):
+        """Stores value in memory and on disk. A failed disk write is counted and
+        otherwise ignored, the result is still served from memory"""
+        self._remember(key, value)
+        if self.disk_dir:
+            try:
+                self._write(key, value)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Result cache write failed for {key}: {e}")
+                with self._lock:
+                    self.stats["disk_errors"] += 1
+
+    def _write(self, key, value):
+        # A temporary file of its own per writer, concurrent puts of a key never
+        # write to or rename the same file
+        fd, tmp_path = tempfile.mkstemp(dir=self.disk_dir, prefix=key + "-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, self._disk_path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        # Older results for the same endpoint and name were keyed on previous
+        # model or data versions and can never be hit again. Only a 16 character
+        # digest may follow the name, longer names that extend it are kept
+        pattern = glob.escape(key.rsplit("-", 1)[0]) + "-" + "?" * 16 + ".json"
+        for path in glob.glob(os.path.join(glob.escape(self.disk_dir), pattern)):
+            if os.path.basename(path) != key + ".json":
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    # Pruned by a concurrent put
+                    pass
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """Forgets the in-memory entries, the disk tier is left alone"""
+        with self._lock:
+            self._entries.clear()
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "capacity": self.capacity, "size": len(self._entries), "disk_dir": self.disk_dir}
+
+
+class TTLCache:
+    """In-memory map whose entries expire ttl seconds after they are stored, evicting
+    the least recently used entry beyond capacity"""
+
+    def __init__(self, ttl=60.0, capacity=1024):
+        self.ttl = ttl
+        self.capacity = capacity
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._entries.pop(key, None)
+                self.stats["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self.stats["hits"] += 1
+            return entry[1]
+
+    def put(self, key, value, ttl=None):
+        """Stores value for ttl seconds, or the cache's ttl when that is shorter"""
+        ttl = self.ttl if ttl is None else min(ttl, self.ttl)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+
+    def snapshot(self):
+        with self._lock:
+            return {**self.stats, "ttl": self.ttl, "capacity": self.capacity, "size": len(self._entries)}
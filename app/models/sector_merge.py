@@ -0,0 +1,171 @@
+import csv
+import json
+import os
+
+import pandas as pd
+
+CSV_DIR = "./stock_data_csv"
+MERGED_DIR = "./merged_sectorwise_data"
+PREFIX = "merged_sector_data_latest_"
+STATE_FILE = ".merge_state.json"
+# Dates kept when a sector file is rebuilt; appends grow it and readers take the tail
+MAX_ROWS = 1000
+# Exports that predate the Category column
+MISSING_CATEGORIES = {"BPCL": "Hydropower"}
+
+
+def sector_key(sector):
+    """Name of a sector's merged file and model, its Category in lower case"""
+    return str(sector).strip().lower()
+
+
+def merged_path(sector, merged_dir=MERGED_DIR):
+    return os.path.join(merged_dir, f"{PREFIX}{sector}.csv")
+
+
+def read_sector_prices(sector, merged_dir=MERGED_DIR, tail=MAX_ROWS):
+    """The merged close series of a sector, its latest tail dates"""
+    return pd.read_csv(merged_path(sector, merged_dir)).tail(tail).reset_index(drop=True)
+
+
+def ensure_category(path, category):
+    """Adds a Category column to a ticker CSV that lacks one. Returns True if the file was rewritten"""
+    with open(path, 'r', newline='') as csvinput:
+        reader = list(csv.reader(csvinput))
+
+    if not reader or 'category' in [column.strip().lower() for column in reader[0]]:
+        return False
+
+    reader[0].append('Category')
+    for row in reader[1:]:
+        row.append(category)
+
+    with open(path, 'w', newline='') as csvoutput:
+        writer = csv.writer(csvoutput)
+        writer.writerows(reader)
+    return True
+
+
+def _read_ticker(path):
+    df = pd.read_csv(path, usecols=lambda column: column.strip().lower() in ('published_date', 'close', 'category'))
+    df.columns = df.columns.str.strip().str.lower()
+
+    # Ensure required columns exist
+    missing = [col for col in ['published_date', 'close', 'category'] if col not in df.columns]
+    if missing:
+        print(f"Skipping {path} (missing columns: {', '.join(missing)})")
+        return None
+
+    df['sector'] = df.pop('category').str.strip().str.lower()
+    df['published_date'] = pd.to_datetime(df['published_date'])
+    return df
+
+
+def _load_state(merged_dir):
+    try:
+        with open(os.path.join(merged_dir, STATE_FILE)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(merged_dir, state):
+    path = os.path.join(merged_dir, STATE_FILE)
+    with open(path + ".tmp", "w") as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _last_merged_date(sector, merged_dir):
+    try:
+        dates = pd.read_csv(merged_path(sector, merged_dir), usecols=['published_date'])['published_date']
+    except FileNotFoundError:
+        return None
+    return pd.Timestamp(dates.iloc[-1]) if len(dates) else None
+
+
+def merge_sectors(csv_dir=CSV_DIR, merged_dir=MERGED_DIR, rebuild=False):
+    """Brings every merged sector file up to date with stock_data_csv.
+
+    The mean close per (sector, date) is computed in one groupby over the
+    tickers that changed since the last run. A sector only gets its new
+    dates appended, unless a ticker joined, left or moved sector, lost rows
+    or gained rows dated inside the already merged range; then the sector
+    is rebuilt from all of its tickers. Returns {sector: "appended N" | "rebuilt"}.
+    """
+    os.makedirs(merged_dir, exist_ok=True)
+    state = {} if rebuild else _load_state(merged_dir)
+
+    files = {}
+    for name in sorted(os.listdir(csv_dir)):
+        ticker, ext = os.path.splitext(name)
+        if ext != ".csv":
+            continue
+        path = os.path.join(csv_dir, name)
+        if ticker in MISSING_CATEGORIES:
+            ensure_category(path, MISSING_CATEGORIES[ticker])
+        stat = os.stat(path)
+        files[ticker] = (path, [stat.st_mtime_ns, stat.st_size])
+
+    changed = [t for t in files if state.get(t, {}).get("signature") != files[t][1]]
+    removed = [t for t in state if t not in files]
+    if not changed and not removed:
+        return {}
+
+    frames = {}
+    for ticker in changed:
+        df = _read_ticker(files[ticker][0])
+        if df is not None:
+            frames[ticker] = df
+
+    last_dates = {}
+    rebuild_sectors = {state[t]["sector"] for t in removed}
+    for ticker, df in frames.items():
+        old = state.get(ticker)
+        sector = df['sector'].iloc[0] if len(df) else None
+        if sector not in last_dates:
+            last_dates[sector] = _last_merged_date(sector, merged_dir)
+        if old is not None and old["sector"] != sector:
+            rebuild_sectors.add(old["sector"])
+
+        last = last_dates[sector]
+        if old is None or old["sector"] != sector or len(df) < old["rows"] or last is None:
+            rebuild_sectors.add(sector)
+        elif ((df['published_date'] > pd.Timestamp(old["last_date"])) & (df['published_date'] <= last)).any():
+            rebuild_sectors.add(sector)
+
+    # A rebuilt sector also needs the tickers in it that did not change
+    for ticker, entry in state.items():
+        if entry["sector"] in rebuild_sectors and ticker in files and ticker not in frames:
+            df = _read_ticker(files[ticker][0])
+            if df is not None:
+                frames[ticker] = df
+
+    if not frames:
+        return {}
+    merged = pd.concat(frames.values(), ignore_index=True).groupby(['sector', 'published_date'])['close'].mean()
+
+    report = {}
+    for sector, series in merged.groupby(level='sector'):
+        series = series.droplevel('sector')
+        path = merged_path(sector, merged_dir)
+        if sector in rebuild_sectors:
+            series.iloc[-MAX_ROWS:].to_frame().to_csv(path)
+            report[sector] = "rebuilt"
+        else:
+            new = series[series.index > last_dates[sector]]
+            if len(new):
+                new.to_frame().to_csv(path, mode='a', header=False)
+                report[sector] = f"appended {len(new)}"
+
+    for ticker in removed:
+        del state[ticker]
+    for ticker, df in frames.items():
+        state[ticker] = {
+            "signature": files[ticker][1],
+            "sector": df['sector'].iloc[0] if len(df) else None,
+            "rows": int(len(df)),
+            "last_date": str(df['published_date'].max().date()) if len(df) else None,
+        }
+    _save_state(merged_dir, state)
+    return report
@@ -0,0 +1,104 @@
+import numpy as np
+
+from models.utils import mape, mse, rmse
+
+# Inference for several models at once. Models with the same weight shapes are
+# stacked along a leading axis and run through one batched pass, instead of a
+# forward() per model.
+
+# Gate activations handled per chunk of stacked models, about 512 KB of float64
+CHUNK_ELEMENTS = 2 ** 16
+
+
+def stack_params(models):
+    """Stacks the weights of models with identical shapes into (models, ...) arrays"""
+    return {p: np.stack([np.asarray(model.params[p]) for model in models]) for p in ('W', 'b', 'Wy', 'by')}
+
+
+def stacked_forward(stacked, X):
+    """Runs model m of the stack over X[m], with X of shape (models, batch, timesteps, input).
+    Same gate math as LSTM.forward_pass_batch, returns (models, batch, output)"""
+    M, B = X.shape[:2]
+    # Models are run a few at a time so the gate arrays stay in cache
+    step = max(1, CHUNK_ELEMENTS // (stacked['W'].shape[1] * max(B, 1)))
+    if M > step:
+        return np.concatenate([
+            stacked_forward({p: w[start:start + step] for p, w in stacked.items()}, X[start:start + step])
+            for start in range(0, M, step)
+        ])
+
+    M, B, T, I = X.shape
+    H = stacked['W'].shape[1] // 4
+    X = X.astype(stacked['W'].dtype, copy=False)
+    h = np.zeros((M, H, B), dtype=X.dtype)
+    c = np.zeros((M, H, B), dtype=X.dtype)
+
+    # Input projections for every model and timestep, shape (models, timesteps, 4*hidden, batch).
+    # The input size is tiny, so a broadcast sum beats a matmul with an inner dimension of 1
+    X_t = X.transpose(0, 2, 3, 1)
+    x_proj = stacked['b'][:, None] + sum(stacked['W'][:, None, :, k:k + 1] * X_t[:, :, k:k + 1] for k in range(I))
+    W_h = np.ascontiguousarray(stacked['W'][:, :, I:])
+
+    for t in range(T):
+        z = x_proj[:, t] + np.matmul(W_h, h)
+        gates = 1 / (1 + np.exp(-z[:, :3 * H]))
+        i, f, o = gates[:, :H], gates[:, H:2 * H], gates[:, 2 * H:]
+        c = f * c + i * np.tanh(z[:, 3 * H:])
+        h = o * np.tanh(c)
+
+    y = np.matmul(stacked['Wy'], h) + stacked['by']
+    return y.transpose(0, 2, 1)
+
+
+def group_models(models, window=6):
+    """Splits {name: LSTM} into lists of names that can share a stack (same window,
+    weight shapes and dtype), as (window, names) pairs; window is used for models
+    that don't record theirs"""
+    groups = {}
+    for name, model in models.items():
+        model_window = getattr(model, "metadata", {}).get("window", window)
+        shapes = tuple(np.shape(model.params[p]) for p in ('W', 'b', 'Wy', 'by'))
+        dtype = str(np.asarray(model.params['W']).dtype)
+        groups.setdefault((model_window, shapes, dtype), []).append(name)
+    return [(key[0], names) for key, names in groups.items()]
+
+
+def min_max_bounds(closes):
+    """Per-series (low, span) of MinMaxScaler, a flat series gets a span of 1 like sklearn"""
+    low = np.array([c.min() for c in closes])
+    span = np.array([c.max() - c.min() for c in closes])
+    span[span == 0] = 1.0
+    return low, span
+
+
+def evaluate_test_windows(models, frames, window=6, train_ratio=0.8):
+    """Scores every model in models ({name: LSTM}) on the test windows of its price
+    frame, as /predict does for one ticker, in one padded batch per stack.
+    Returns {name: {"predictions", "actual", "metrics"}}"""
+    results = {}
+    for window, names in group_models(models, window):
+        closes = [frames[name]['close'].values.astype(np.float64) for name in names]
+        low, span = min_max_bounds(closes)
+
+        # Chronological split as in windowing.train_test_split, test windows padded to one length
+        counts = [max(len(c) - window, 0) for c in closes]
+        starts = [int(train_ratio * n) for n in counts]
+        lengths = [n - start for n, start in zip(counts, starts)]
+        X = np.zeros((len(names), max(lengths, default=0), window, 1))
+        for m, (c, start, length) in enumerate(zip(closes, starts, lengths)):
+            scaled = (c - low[m]) / span[m] * 2 - 1
+            X[m, :length, :, 0] = np.lib.stride_tricks.sliding_window_view(scaled, window)[start:start + length]
+
+        y = stacked_forward(stack_params([models[name] for name in names]), X)[:, :, 0]
+        predictions = (y + 1) / 2 * span[:, None] + low[:, None]
+
+        for m, name in enumerate(names):
+            start, length = starts[m], lengths[m]
+            predicted = predictions[m, :length].reshape(-1, 1)
+            actual = closes[m][window + start:window + start + length].reshape(-1, 1)
+            results[name] = {
+                "predictions": predicted.flatten().tolist(),
+                "actual": actual.flatten().tolist(),
+                "metrics": {"MSE": mse(actual, predicted), "RMSE": rmse(actual, predicted), "MAPE": mape(actual, predicted)},
+            }
+    return results
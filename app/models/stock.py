@@ -1,12 +1,34 @@
-from os import listdir
+import os
 import pandas as pd
+from models.price_store import date_bounds, get_store, select_rows
 
-def get_stock_data(ticker):
-    csv = ticker + ".csv"
+CSV_DIR = "./stock_data_csv"
+
+def get_stock_data(ticker, tail=None, start=None, end=None):
+    """Price history of a ticker, optionally limited to its last `tail` rows and/or a start..end date range.
+    Served from the memory-mapped price store when it is built and up to date, from the CSV otherwise"""
+    path = os.path.join(CSV_DIR, ticker + ".csv")
     
-    if csv in listdir(path="./stock_data_csv"):
-        df = pd.read_csv("./stock_data_csv/" + csv)
-    else:
+    if not os.path.isfile(path):
         raise FileNotFoundError(f"The file for {ticker} is not found in the stock_data_csv folder.")
     
-    return df
+    store = get_store()
+    if store is not None and ticker in store and store.is_fresh(ticker, path):
+        return store.read(ticker, tail=tail, start=start, end=end)
+    
+    return read_csv_prices(path, tail=tail, start=start, end=end)
+
+
+def read_csv_prices(path, tail=None, start=None, end=None):
+    """get_stock_data's fallback, the rows of a ticker CSV selected like the store does"""
+    df = pd.read_csv(path)
+    # Nanoseconds like the store, newer pandas parses to microseconds
+    df["published_date"] = pd.to_datetime(df["published_date"]).astype("datetime64[ns]")
+    
+    dates = df["published_date"].values.astype("datetime64[D]")
+    lo, hi, mask = select_rows(dates, *date_bounds(dates), tail=tail, start=start, end=end)
+    
+    df = df.iloc[lo:hi]
+    if mask is not None:
+        df = df[mask]
+    return df.reset_index(drop=True)
@@ -0,0 +1,171 @@
+import math
+import multiprocessing
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+from sklearn.preprocessing import MinMaxScaler
+
+from models.bulk_train import BLAS_THREAD_VARIABLES, _limit_blas_threads
+from models.lstm import LSTM
+from models.stock import get_stock_data
+from models.utils import mape, mse, rmse
+from models.windowing import make_windows, train_test_split
+
+# The hyperparameters of /predict_with_normal_lstm a sweep can vary
+PARAMS = ("window_size", "learning_rate", "epochs", "batch_size")
+DEFAULTS = {"window_size": 6, "learning_rate": 0.0014, "epochs": 15, "batch_size": 15}
+
+
+def _check_values(param, values):
+    for value in values:
+        if not math.isfinite(value):
+            raise ValueError(f"{param} must be finite, got {value}")
+        if param == "learning_rate":
+            if value <= 0:
+                raise ValueError(f"learning_rate must be positive, got {value}")
+        elif value != int(value) or value < 1:
+            raise ValueError(f"{param} must be a whole number of at least 1, got {value}")
+
+
+def expand_space(space, mode="grid", trials=20, seed=0, max_trials=None):
+    """Trial configurations from space ({param: [values]}, missing params keep their
+    default): every combination for mode="grid", or up to trials distinct random
+    combinations for mode="random". Raises ValueError for invalid values or when
+    there would be more than max_trials configurations"""
+    unknown = set(space) - set(PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {', '.join(sorted(unknown))}")
+    if any(not values for values in space.values()):
+        raise ValueError("Every sweep parameter needs at least one value")
+    if mode not in ("grid", "random"):
+        raise ValueError(f"Unknown sweep mode {mode}, use grid or random")
+    if mode == "random" and trials < 1:
+        raise ValueError("Random sweeps need at least 1 trial")
+    for param, values in space.items():
+        _check_values(param, values)
+
+    values = [sorted(set(space.get(p, [DEFAULTS[p]]))) for p in PARAMS]
+    total = math.prod(len(v) for v in values)
+    count = min(trials, total) if mode == "random" else total
+    # Checked before any combination is built, a large space is only counted
+    if max_trials is not None and count > max_trials:
+        raise ValueError(f"Sweep has {count} trials, the limit is {max_trials}")
+
+    if mode == "random":
+        # Combinations are drawn by their index in the grid, without building it
+        indices = random.Random(seed).sample(range(total), count)
+    else:
+        indices = range(total)
+
+    configs = []
+    for index in indices:
+        combination = []
+        for options in reversed(values):
+            index, position = divmod(index, len(options))
+            combination.append(options[position])
+        w, lr, e, b = reversed(combination)
+        configs.append({"window_size": int(w), "learning_rate": float(lr), "epochs": int(e), "batch_size": int(b)})
+    return configs
+
+
+def checkpoints(max_epochs, min_epochs=1, eta=3):
+    """Epoch counts at which trials are compared, growing by eta"""
+    epochs, points = min_epochs, []
+    while epochs < max_epochs:
+        points.append(epochs)
+        epochs *= eta
+    return points
+
+
+def _train_trial(model, X, y, epochs, batch_size):
+    # Trials continue from where the previous checkpoint left them, so skip the plot
+    model.train(X, y, epochs=epochs, batch_size=batch_size, plot=False)
+    return model, [float(loss) for loss in model.loss_history]
+
+
+def run_sweep(ticker, configs, workers=None, eta=3, min_epochs=1, progress=None):
+    """Trains a model per configuration on the ticker's last 1000 closes and scores it
+    like /predict_with_normal_lstm, with successive halving.
+
+    At each checkpoint only the best 1/eta of the trials still training, by
+    training loss, continue; the rest are pruned and scored as they are. The
+    data is scaled once and windowed once per window size. progress, if
+    given, is called with the trial list after every checkpoint. Returns the
+    trials with their status, epochs_run, loss history and metrics.
+    """
+    df = get_stock_data(ticker, tail=1000)
+    prices = df['close'].values.reshape(-1, 1)
+    scaler = MinMaxScaler(feature_range=(-1, 1))
+    scaled = scaler.fit_transform(prices)
+    splits = {window: train_test_split(*make_windows(scaled, window)) for window in {c["window_size"] for c in configs}}
+
+    trials = [
+        {
+            "trial": k,
+            "params": config,
+            "status": "running",
+            "epochs_run": 0,
+            "loss": None,
+            "losses": [],
+            "metrics": None,
+            "model": LSTM(input_size=1, hidden_size=30, output_size=1, learning_rate=config["learning_rate"]),
+        }
+        for k, config in enumerate(configs)
+    ]
+
+    # Worker processes inherit these before numpy is imported under spawn
+    for variable in BLAS_THREAD_VARIABLES:
+        os.environ.setdefault(variable, "1")
+    workers = min(workers or os.cpu_count() or 1, max(len(trials), 1))
+
+    # Spawned rather than forked, sweeps are started from a thread of the server
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_limit_blas_threads) as pool:
+        for checkpoint in checkpoints(max(c["epochs"] for c in configs), min_epochs, eta) + [None]:
+            running = [t for t in trials if t["status"] == "running"]
+            futures = {}
+            for trial in running:
+                params = trial["params"]
+                target = params["epochs"] if checkpoint is None else min(checkpoint, params["epochs"])
+                X_train, y_train, _, _ = splits[params["window_size"]]
+                epochs = target - trial["epochs_run"]
+                future = pool.submit(_train_trial, trial["model"], X_train, y_train, epochs, params["batch_size"])
+                futures[future] = (trial, epochs)
+
+            for future, (trial, epochs) in futures.items():
+                trial["model"], losses = future.result()
+                trial["losses"] += losses
+                trial["epochs_run"] += len(losses)
+                trial["loss"] = trial["losses"][-1] if trial["losses"] else None
+                # Training also stops by itself once the gradient vanishes
+                if trial["epochs_run"] >= trial["params"]["epochs"] or len(losses) < epochs:
+                    trial["status"] = "completed"
+
+            if checkpoint is not None:
+                contenders = sorted((t for t in trials if t["status"] == "running"), key=lambda t: t["loss"])
+                for trial in contenders[max(1, math.ceil(len(contenders) / eta)):]:
+                    trial["status"] = "pruned"
+            else:
+                for trial in running:
+                    trial["status"] = "completed"
+
+            if progress is not None:
+                progress(public_trials(trials))
+
+    for trial in trials:
+        _, _, X_test, y_test = splits[trial["params"]["window_size"]]
+        y_pred, _ = trial.pop("model").forward_batch(X_test)
+        predictions = scaler.inverse_transform(y_pred[:, 0].reshape(-1, 1))
+        actual = scaler.inverse_transform(y_test.reshape(-1, 1))
+        trial["metrics"] = {"MSE": float(mse(actual, predictions)), "RMSE": float(rmse(actual, predictions)), "MAPE": float(mape(actual, predictions))}
+    return trials
+
+
+def public_trials(trials):
+    return [{key: value for key, value in trial.items() if key != "model"} for trial in trials]
+
+
+def best_trial(trials):
+    completed = [t for t in trials if t["status"] == "completed" and t["metrics"]]
+    return min(completed, key=lambda t: t["metrics"]["MSE"]) if completed else None
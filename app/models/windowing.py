@@ -0,0 +1,29 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+def make_windows(series, window, horizon=1):
+    """Builds sliding-window inputs and targets as read-only strided views over series.
+
+    X[k] is series[k:k + window] with shape (window, features) and y[k] is
+    series[k + window:k + window + horizon] flattened to (horizon * features,),
+    so a single-step target keeps the (n, features) layout of the old loops.
+    """
+    series = np.asarray(series)
+    if series.ndim == 1:
+        series = series.reshape(-1, 1)
+    features = series.shape[1]
+    n = len(series) - window - horizon + 1
+
+    if n <= 0:
+        return np.empty((0, window, features)), np.empty((0, horizon * features))
+
+    X = sliding_window_view(series, window, axis=0)[:n].transpose(0, 2, 1)
+    y = sliding_window_view(series[window:], horizon, axis=0)[:n].transpose(0, 2, 1).reshape(n, horizon * features)
+    return X, y
+
+
+def train_test_split(X, y, train_ratio=0.8):
+    """Chronological split, the first train_ratio of the windows go to training. Returns views"""
+    split = int(train_ratio * len(X))
+    return X[:split], y[:split], X[split:], y[split:]
@@ -0,0 +1,51 @@
+import argparse
+import json
+from models.sweep import DEFAULTS, best_trial, expand_space, run_sweep
+
+# Hyperparameter sweep for one ticker from the command line, the same search POST /sweeps
+# runs. Each hyperparameter takes one or more values, the ones left out keep their default.
+parser = argparse.ArgumentParser(description="Sweep /predict_with_normal_lstm hyperparameters for a ticker")
+parser.add_argument("ticker")
+parser.add_argument("--window-size", type=int, nargs="+", default=[DEFAULTS["window_size"]])
+parser.add_argument("--learning-rate", type=float, nargs="+", default=[DEFAULTS["learning_rate"]])
+parser.add_argument("--epochs", type=int, nargs="+", default=[DEFAULTS["epochs"]])
+parser.add_argument("--batch-size", type=int, nargs="+", default=[DEFAULTS["batch_size"]])
+parser.add_argument("--mode", choices=["grid", "random"], default="grid")
+parser.add_argument("--trials", type=int, default=20, help="Combinations to sample in random mode")
+parser.add_argument("--seed", type=int, default=0)
+parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the number of cores")
+parser.add_argument("--eta", type=int, default=3, help="Keep the best 1/eta of the trials at each checkpoint")
+parser.add_argument("--min-epochs", type=int, default=1, help="Epochs before the first checkpoint")
+parser.add_argument("--output", help="Write the trials to this JSON file")
+args = parser.parse_args()
+
+space = {
+    "window_size": args.window_size,
+    "learning_rate": args.learning_rate,
+    "epochs": args.epochs,
+    "batch_size": args.batch_size,
+}
+configs = expand_space(space, args.mode, args.trials, args.seed)
+print(f"{len(configs)} trials for {args.ticker}")
+
+
+def report(trials):
+    done = sum(t["status"] != "running" for t in trials)
+    print(f"checkpoint: {done}/{len(trials)} trials completed or pruned")
+
+
+trials = run_sweep(args.ticker, configs, workers=args.workers, eta=args.eta, min_epochs=args.min_epochs, progress=report)
+
+print(f"\n{'window':>6} {'lr':>8} {'epochs':>6} {'batch':>5} {'status':<10} {'ran':>4} {'loss':>9} {'MSE':>12} {'MAPE':>8}")
+for trial in sorted(trials, key=lambda t: t["metrics"]["MSE"]):
+    p, m = trial["params"], trial["metrics"]
+    print(f"{p['window_size']:>6} {p['learning_rate']:>8.5f} {p['epochs']:>6} {p['batch_size']:>5} {trial['status']:<10} "
+          f"{trial['epochs_run']:>4} {trial['loss']:>9.5f} {m['MSE']:>12.4f} {m['MAPE']:>8.3f}")
+
+best = best_trial(trials)
+if best is not None:
+    print(f"\nbest completed trial: {best['params']} MSE {best['metrics']['MSE']:.4f}")
+
+if args.output:
+    with open(args.output, "w") as f:
+        json.dump(trials, f, indent=1)
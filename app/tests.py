@@ -1,16 +1,40 @@
 import numpy as np
 import pandas as pd
+import joblib
+import asyncio
+import glob
+import gzip
+import json
+import os
+import shutil
+import struct
+import tempfile
+import time
 from sklearn.preprocessing import MinMaxScaler
+from models.bulk_train import train_one
+from models.db_writer import BatchWriter
+from models.eda import PLOTS, document_path, plot_path, update_eda
+from models.forecast import recursive_forecast
+from models.history import compress, lttb, minmax, price_series, to_binary
+from models.instrumentation import REQUEST_SECONDS, Histogram, TimingMiddleware, span
+from models.stacked import evaluate_test_windows, stack_params
+from models.jobs import JobManager, QueueFullError
+from models.artifact import fingerprint_prices, load_model, save_model
+from models.lstm import LSTM
+from models.manifest import TickerManifest
+from models.price_store import PriceStore, build_store
+from models.registry import ModelRegistry
+from models.result_cache import ResultCache, TTLCache
+from models.sector_merge import merge_sectors, merged_path, sector_key
 from models.stock import get_stock_data
+from models.sweep import checkpoints, expand_space, run_sweep
 from models.utils import mape, mse, rmse
+from models.windowing import make_windows, train_test_split
 
 scaler = MinMaxScaler(feature_range=(-1, 1))
 
 def test_train_test_split(ticker="AHPC", window_size=6):
-    df = get_stock_data(ticker)
-    
-    if(len(df)>1000):
-            df = df.iloc[-1000::1,:]
+    df = get_stock_data(ticker, tail=1000)
 
     prices = df['close'].values.reshape(-1, 1)
 
@@ -18,27 +42,21 @@ def test_train_test_split(ticker="AHPC", window_size=6):
     scaled = scaler.fit_transform(prices)
 
     # Create sequences
-    X, y = [], []
-    window = 6
-    for i in range(window, len(scaled)):
-        X.append(scaled[i-window:i])
-        y.append(scaled[i])
-
-    X, y = np.array(X), np.array(y)
-    split = int(0.8 * len(X))
-    X_train, y_train = X[:split], y[:split]
-    X_test, y_test = X[split:], y[split:]
+    X, y = make_windows(scaled, window_size)
+    X_train, y_train, X_test, y_test = train_test_split(X, y)
     
 
     # Assertions for train-test split
     assert len(X_train) == int(0.8 * len(X)), "Train data does not match 80% of the dataset"
     assert len(X_test) == len(X) - len(X_train), "Test data does not match 20% of the dataset"
     
-    # Ensure no data leakage
-    for train_seq in X_train:
-        for test_seq in X_test:
-            if np.array_equal(train_seq, test_seq):
-                raise ValueError(f"Data leakage detected! Sequence {train_seq.flatten()} is present in both train and test sets.")
+    # Ensure no data leakage: window the row positions instead of the prices, so
+    # every training target must come before the first test target
+    X_idx, y_idx = make_windows(np.arange(len(scaled)), window_size)
+    _, y_train_idx, X_test_idx, y_test_idx = train_test_split(X_idx, y_idx)
+    if len(y_test_idx) and y_train_idx.max() >= y_test_idx.min():
+        raise ValueError(f"Data leakage detected! Training target row {y_train_idx.max()} is not before the test period.")
+    assert np.array_equal(X_test, scaled[X_test_idx[..., 0]]), "Test windows do not line up with their row positions"
     
     print("Test Passed: Train-test split validation passed - 80:20 ratio and no data leakage. ✅")
     
@@ -50,11 +68,35 @@ def test_get_stock_data():
         
         assert not df.empty, f"Data for {ticker} should not be empty."
         assert 'close' in df.columns, f"Column 'Close' not found in the data."
+
+        # Served from the price store or the CSV, callers get the same columns and dtypes
+        csv_columns = list(pd.read_csv(f"./stock_data_csv/{ticker}.csv", nrows=0).columns)
+        with tempfile.TemporaryDirectory() as store_dir:
+            build_store(store_dir=store_dir)
+            stored = PriceStore(store_dir).read(ticker)
+        assert list(df.columns) == csv_columns == list(stored.columns), f"Columns differ: {list(stored.columns)}"
+        assert df.dtypes.equals(stored.dtypes), f"Dtypes differ between the store and the CSV"
         print(f"Test passed: {ticker} data loaded successfully. ✅")
         
     except FileNotFoundError as e:
         print(e)
 
+def test_price_store(ticker="AHPC"):
+    with tempfile.TemporaryDirectory() as store_dir:
+        build_store(store_dir=store_dir)
+        store = PriceStore(store_dir)
+        csv = pd.read_csv(f"./stock_data_csv/{ticker}.csv")
+        dates = pd.to_datetime(csv["published_date"])
+
+        tail = store.read(ticker, tail=1000)
+        assert np.array_equal(tail["close"].values, csv["close"].values[-1000:]), "Tail rows differ from the CSV"
+
+        in_range = (dates >= "2020-01-01") & (dates <= "2021-12-31")
+        ranged = store.read(ticker, start="2020-01-01", end="2021-12-31")
+        assert np.array_equal(ranged["close"].values, csv["close"].values[in_range]), "Date range rows differ from the CSV"
+
+    print(f"Test passed: Price store slices for {ticker} match the CSV. ✅")
+
 def test_mape(actual, prediction):
     try:
         result = mape(actual, prediction)
@@ -88,12 +130,525 @@ def test_rmse(actual, prediction):
     except Exception as e:
         print(f"RMSE test failed: {e}")
 
+def test_forward_batch():
+    model = LSTM(input_size=1, hidden_size=30, output_size=1)
+    X = np.random.uniform(-1, 1, size=(20, 6, 1))
+
+    y_batch, h_batch = model.forward_batch(X)
+    for k, seq in enumerate(X):
+        y_single, h_single = model.forward(seq)
+        assert np.allclose(y_batch[k], y_single[:, 0]), f"Batched prediction mismatch for sequence {k}"
+        assert np.allclose(h_batch[k], h_single[:, 0]), f"Batched hidden state mismatch for sequence {k}"
+
+    print("Test passed: Batched forward pass matches the per-sequence forward pass. ✅")
+
+def test_bptt_gradients():
+    model = LSTM(input_size=1, hidden_size=30, output_size=1)
+    X = np.random.uniform(-1, 1, size=(15, 6, 1))
+    y = np.random.uniform(-1, 1, size=(15, 1))
+
+    for name, diff in model.check_gradients(X, y).items():
+        assert diff < 1e-8, f"BPTT gradient for {name} differs from autograd by {diff}"
+
+    print("Test passed: BPTT gradients match autograd. ✅")
+
+def test_legacy_model_conversion(ticker="AHPC"):
+    model = joblib.load(f"SavedModel/{ticker}.pkl")
+    hidden = model.hidden_size
+
+    assert set(model.params) == {"W", "b", "Wy", "by"}, "Legacy per-gate weights were not converted"
+    assert model.params["W"].shape == (4 * hidden, model.input_size + hidden), "Fused weight has the wrong shape"
+    assert model.velocity["W"].shape == model.params["W"].shape, "Optimizer state was not converted"
+
+    print(f"Test passed: Legacy {ticker} model converted to the fused gate layout. ✅")
+
+def test_model_artifact_roundtrip():
+    model = LSTM(input_size=1, hidden_size=30, output_size=1)
+    X = np.random.uniform(-1, 1, size=(40, 6, 1))
+    y = np.random.uniform(-1, 1, size=(40, 1))
+    model.train(X, y, epochs=2, batch_size=10)
+    df = pd.DataFrame({"published_date": pd.date_range("2024-01-01", periods=len(X)), "close": y[:, 0]})
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        save_model(model, model_dir, "TEST", window=6, fingerprint=fingerprint_prices(df))
+        served = load_model(model_dir, "TEST")
+        resumed = load_model(model_dir, "TEST", mmap=False, with_state=True)
+
+        assert np.allclose(served.forward_batch(X)[0], model.forward_batch(X)[0]), "Loaded weights give different predictions"
+        assert served.metadata["data"]["last_date"] == "2024-02-09", "Data fingerprint was not stored"
+        assert np.array_equal(resumed.velocity["W"], model.velocity["W"]), "Optimizer state was not restored"
+        assert resumed.loss_history == model.loss_history, "Loss history was not restored"
+
+    print("Test passed: Model artifact round trip keeps weights, state and metadata. ✅")
+
+def test_model_registry():
+    with tempfile.TemporaryDirectory() as model_dir:
+        for ticker in ("AHPC", "AKPL", "API"):
+            for path in glob.glob(f"SavedModel/{ticker}.*"):
+                shutil.copy(path, model_dir)
+        registry = ModelRegistry(model_dir, capacity=2, check_interval=0)
+
+        first = registry.get("AHPC")
+        assert registry.get("AHPC") is first and registry.stats["hits"] == 1, "A cached model should be reused"
+        registry.get("AKPL")
+        registry.get("AHPC")
+        registry.get("API")  # Evicts AKPL, the least recently used
+        assert list(registry.snapshot()["cached"]) == ["AHPC", "API"] and registry.stats["evictions"] == 1
+
+        # A retrained model changes its signature and is loaded again
+        metadata = os.path.join(model_dir, "AHPC.json")
+        stat = os.stat(metadata)
+        os.utime(metadata, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert registry.get("AHPC") is not first and registry.stats["reloads"] == 1
+
+        popularity = os.path.join(model_dir, "popularity.json")
+        registry.save_popularity(popularity)
+        restarted = ModelRegistry(model_dir, capacity=2, check_interval=0)
+        hottest = restarted.load_popularity(popularity)
+        assert hottest[0] == "AHPC" and set(hottest) == {"AHPC", "AKPL", "API"}
+        assert restarted.preload(hottest + ["NOPE"]) == hottest[:2], "Preload should stop at capacity"
+        assert restarted.snapshot()["size"] == 2 and restarted.stats["misses"] == 2
+    print("Test passed: Model registry evicts, reloads retrained models and preloads the hottest. ✅")
+
 actual = np.array([100, 150, 200, 250, 300])
 prediction = np.array([110, 145, 195, 240, 310])
 
+def test_training_progress():
+    model = LSTM(input_size=1, hidden_size=30, output_size=1)
+    X = np.random.uniform(-1, 1, size=(40, 6, 1))
+    y = np.random.uniform(-1, 1, size=(40, 1))
+    events = []
+    model.train(X, y, epochs=2, batch_size=10, progress=events.append)
+
+    epochs = [e for e in events if e["event"] == "epoch"]
+    assert len(events) == 2 * 4 + 2, "Expected an event per batch and per epoch"
+    assert [e["loss"] for e in epochs] == model.loss_history, "Epoch events should carry the epoch loss"
+    assert epochs[-1]["eta_seconds"] == 0 and epochs[-1]["grad_norm"] > 0
+    print("Test passed: Training reports progress per batch and epoch. ✅")
+
+def test_incremental_update(ticker="AHPC"):
+    df = get_stock_data(ticker, tail=1000)
+    with tempfile.TemporaryDirectory() as model_dir:
+        train_one(ticker, df.iloc[:-5], model_dir, epochs=3)
+        row = train_one(ticker, df, model_dir, epochs=3, incremental=True)
+        assert row["status"] == "fine-tuned", f"Expected a fine-tune, got {row}"
+
+        spike = df.copy()
+        spike.loc[spike.index[-1], "close"] = 3 * df["close"].max()
+        row = train_one(ticker, spike, model_dir, epochs=3, incremental=True)
+        assert row["status"] == "trained" and row["note"].startswith("price drift"), "Drift should force a full retrain"
+    print("Test passed: Incremental updates fine-tune and fall back on drift. ✅")
+
+def test_sector_merge():
+    with tempfile.TemporaryDirectory() as merged_dir:
+        assert merge_sectors(merged_dir=merged_dir)["hydropower"] == "rebuilt"
+        assert merge_sectors(merged_dir=merged_dir) == {}, "Unchanged tickers should not be merged again"
+        with open(merged_path("hydropower", merged_dir)) as rebuilt, open(merged_path("hydropower")) as shipped:
+            assert rebuilt.read() == shipped.read(), "Rebuilt sector file differs from merged_sectorwise_data"
+
+    # Clients may use any case, lookups go through the manifest's spelling and the file key
+    manifest = TickerManifest()
+    for spelling in ("hydropower", " HYDROPOWER", "Hydropower"):
+        sector = manifest.resolve_sector(spelling)
+        assert sector == "Hydropower" and "AHPC" in manifest.sectors()[sector]
+        assert os.path.exists(merged_path(sector_key(sector))), f"No merged file for {spelling}"
+    assert manifest.resolve_sector("nope") is None
+    print("Test passed: Sector files are rebuilt identically, skipped when unchanged and found in any case. ✅")
+
+def test_ticker_manifest():
+    with tempfile.TemporaryDirectory() as csv_dir:
+        for ticker in ("AHPC", "AKPL"):
+            shutil.copy(f"./stock_data_csv/{ticker}.csv", csv_dir)
+        manifest = TickerManifest(csv_dir, refresh_interval=0)
+        entries, etag = dict(manifest.refresh()), manifest.etag
+        assert entries["AHPC"]["sector"] == "Hydropower" and entries["AHPC"]["rows"] == len(pd.read_csv(f"{csv_dir}/AHPC.csv"))
+        assert manifest.refresh()["AKPL"] is entries["AKPL"] and manifest.etag == etag, "Unchanged files should not be parsed again"
+
+        with open(f"{csv_dir}/AHPC.csv", "a") as f:
+            f.write("2030-01-01,1.0,1.0,1.0,1.0,0.0,1.0,1.0,0,Hydropower\n")
+        refreshed = manifest.refresh()
+        assert refreshed["AHPC"]["rows"] == entries["AHPC"]["rows"] + 1 and refreshed["AHPC"]["last_date"] == "2030-01-01"
+        assert refreshed["AKPL"] is entries["AKPL"] and manifest.etag != etag, "Only the changed file should be parsed again"
+
+        # Between scheduled scans a miss doesn't rescan the folder
+        manifest.refresh_interval = 60
+        shutil.copy("./stock_data_csv/API.csv", csv_dir)
+        assert not manifest.has_ticker("API")
+        manifest.refresh_interval = 0
+        assert manifest.has_ticker("API"), "The next scheduled scan should find the new file"
+    print("Test passed: The ticker manifest reparses only changed files and throttles rescans. ✅")
+
+def test_eda_pipeline(ticker="AHPC"):
+    with tempfile.TemporaryDirectory() as csv_dir, tempfile.TemporaryDirectory() as eda_dir:
+        shutil.copy(f"./stock_data_csv/{ticker}.csv", csv_dir)
+        assert update_eda(csv_dir, eda_dir) == {ticker: "generated"}
+        assert update_eda(csv_dir, eda_dir) == {}, "Unchanged CSVs should be skipped"
+
+        with open(document_path(ticker, eda_dir)) as f:
+            document = json.load(f)
+        assert document["statistics"]["close"]["count"] == len(pd.read_csv(f"./stock_data_csv/{ticker}.csv"))
+        assert document["correlation_matrix"]["close"]["close"] == 1.0
+        for plot in PLOTS:
+            with open(plot_path(ticker, plot, eda_dir), "rb") as f:
+                assert f.read(8) == b"\x89PNG\r\n\x1a\n", f"{plot} is not a PNG"
+    print("Test passed: EDA documents and plots are generated once per CSV change. ✅")
+
+def test_stacked_forecast():
+    models = [LSTM(input_size=1, hidden_size=30, output_size=1) for _ in range(3)]
+    for k, model in enumerate(models[1:], 1):
+        model.params['W'] = model.params['W'] * (1 + 0.1 * k)
+    windows = np.random.uniform(-1, 1, size=(3, 6))
+
+    steps = recursive_forecast(stack_params(models), windows, horizon=4)
+    for model, window, forecast in zip(models, windows, steps):
+        window = list(window)
+        for step in range(4):
+            y = model.forward_batch(np.array(window[-6:]).reshape(1, 6, 1))[0][0, 0]
+            assert np.isclose(forecast[step], y), "Stacked forecast differs from the model's own forward pass"
+            window.append(y)
+    print("Test passed: Stacked recursive forecast matches per-model inference. ✅")
+
+def test_bulk_evaluation():
+    models = {"A": LSTM(input_size=1, hidden_size=30, output_size=1), "B": LSTM(input_size=1, hidden_size=30, output_size=1)}
+    models["B"].params['W'] = models["B"].params['W'] * 1.1
+    frames = {"A": pd.DataFrame({"close": np.random.uniform(100, 200, 120)}), "B": pd.DataFrame({"close": np.random.uniform(10, 20, 57)})}
+    results = evaluate_test_windows(models, frames)
+
+    for name, model in models.items():
+        scaler = MinMaxScaler(feature_range=(-1, 1))
+        X, y = make_windows(scaler.fit_transform(frames[name][['close']].values), 6)
+        _, _, X_test, y_test = train_test_split(X, y)
+        expected = scaler.inverse_transform(model.forward_batch(X_test)[0])
+        assert np.allclose(results[name]["predictions"], expected.flatten()), "Padded stacked predictions differ"
+        assert np.allclose(results[name]["actual"], scaler.inverse_transform(y_test).flatten())
+    print("Test passed: Bulk evaluation matches per-ticker predictions. ✅")
+
+def test_float32_model():
+    model = LSTM(input_size=1, hidden_size=30, output_size=1, dtype="float32")
+    X = np.random.uniform(-1, 1, size=(40, 6, 1))
+    y = np.random.uniform(-1, 1, size=(40, 1))
+    model.train(X, y, epochs=2, batch_size=10)
+    predictions, states = model.forward_batch(X)
+    assert predictions.dtype == states.dtype == np.float32, "float64 leaked into float32 inference"
+    assert all(model.params[p].dtype == model.velocity[p].dtype == np.float32 for p in model.params)
+
+    with tempfile.TemporaryDirectory() as model_dir:
+        assert save_model(model, model_dir, "TEST", window=6)["dtype"] == "float32"
+        loaded = load_model(model_dir, "TEST")
+        assert loaded.dtype == np.float32 and np.array_equal(loaded.forward_batch(X)[0], predictions)
+
+    reference = model.astype("float64")
+    assert np.allclose(reference.forward_batch(X)[0], predictions, atol=1e-5), "float32 and float64 predictions differ"
+    print("Test passed: float32 models stay float32 and round trip through artifacts. ✅")
+
+def test_early_stopping():
+    X = np.random.uniform(-1, 1, size=(60, 6, 1))
+    y = np.random.uniform(-1, 1, size=(60, 1))
+    model = LSTM(input_size=1, hidden_size=30, output_size=1)
+    # No epoch can beat the first by a min_delta this large
+    model.train(X, y, epochs=10, batch_size=15, validation_split=0.25, patience=2, min_delta=1.0, plot=False)
+    assert len(model.loss_history) == len(model.val_loss_history) == 3 and model.best_epoch == 1
+    val_pred, _ = model.forward_batch(X[-15:])
+    assert np.isclose(np.mean((val_pred - y[-15:]) ** 2), model.val_loss_history[0]), "Best weights were not restored"
+    print("Test passed: Training stops on a validation plateau and keeps the best epoch. ✅")
+
+def test_result_cache_disk_tier():
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResultCache(disk_dir=cache_dir)
+        for horizon in (5, 10):
+            cache.put(cache.key("forecast", f"AHPC-h{horizon}", "model-v1", "data-v1"), {"horizon": horizon})
+
+        # A fresh process only has the disk tier
+        restarted = ResultCache(disk_dir=cache_dir)
+        for horizon in (5, 10):
+            key = restarted.key("forecast", f"AHPC-h{horizon}", "model-v1", "data-v1")
+            assert restarted.get(key) == {"horizon": horizon}, f"Horizon {horizon} was evicted by another horizon"
+
+        # Names that extend another name are not its older versions
+        restarted.put(restarted.key("forecast", "AHPC", "model-v1", "data-v1"), {"horizon": None})
+        assert restarted.key("forecast", "AHPC-h10", "model-v1", "data-v1") + ".json" in os.listdir(cache_dir)
+        os.remove(os.path.join(cache_dir, restarted.key("forecast", "AHPC", "model-v1", "data-v1") + ".json"))
+
+        # A newer model replaces only the entry of its own horizon
+        restarted.put(restarted.key("forecast", "AHPC-h5", "model-v2", "data-v1"), {"horizon": 5})
+        assert sorted(os.listdir(cache_dir)) == sorted([
+            restarted.key("forecast", "AHPC-h5", "model-v2", "data-v1") + ".json",
+            restarted.key("forecast", "AHPC-h10", "model-v1", "data-v1") + ".json",
+        ])
+    print("Test passed: Disk cached results are only replaced by newer versions of themselves. ✅")
+
+def test_result_cache_concurrent_puts():
+    from concurrent.futures import ThreadPoolExecutor
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        cache = ResultCache(disk_dir=cache_dir)
+        keys = [cache.key("predict", "AHPC", "model-v1", f"data-v{i % 4}") for i in range(200)]
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            list(pool.map(lambda key: cache.put(key, {"key": key}), keys))
+        assert cache.stats["disk_errors"] == 0, "Concurrent puts of one name should not fail"
+        left = os.listdir(cache_dir)
+        assert all(name.endswith(".json") for name in left), f"Temporary files were left behind: {left}"
+        assert len(left) <= 4, "Older versions should have been pruned"
+
+        # A disk tier that can't be written to still serves from memory
+        shutil.rmtree(cache_dir)
+        key = cache.key("predict", "AKPL", "model-v1", "data-v1")
+        cache.put(key, {"ticker": "AKPL"})
+        assert cache.get(key) == {"ticker": "AKPL"} and cache.stats["disk_errors"] == 1
+        os.makedirs(cache_dir)
+    print("Test passed: Concurrent and failed disk writes never fail a cached result. ✅")
+
+def test_batch_writer():
+    from sqlalchemy import Column, Integer, create_engine
+    from sqlalchemy.orm import declarative_base, sessionmaker
+
+    Base = declarative_base()
+
+    class Row(Base):
+        __tablename__ = "rows"
+        id = Column(Integer, primary_key=True)
+        value = Column(Integer, nullable=False)
+
+    with tempfile.TemporaryDirectory() as db_dir:
+        engine = create_engine(f"sqlite:///{db_dir}/test.db")
+        Base.metadata.create_all(engine)
+        writer = BatchWriter(sessionmaker(bind=engine))
+        for value in range(50):
+            writer.add(Row(value=value))
+        writer.add(Row(value=None))  # Violates NOT NULL, only this row is dropped
+        writer.close()
+
+        with sessionmaker(bind=engine)() as db:
+            assert db.query(Row).count() == 50
+        assert writer.stats["written"] == 50 and writer.stats["failed"] == 1
+        engine.dispose()
+
+    cache = TTLCache(ttl=0.2, capacity=2)
+    cache.put("a", 1)
+    cache.put("b", 2, ttl=0.05)
+    cache.put("c", 3)
+    assert cache.get("a") is None and cache.get("c") == 3, "Least recently used entry should be evicted"
+    time.sleep(0.1)
+    assert cache.get("b") is None and cache.get("c") == 3, "Entries should expire after their ttl"
+    print("Test passed: Batched writes commit every valid row and cached entries expire. ✅")
+
+def sleep_job(seconds, progress=None):
+    time.sleep(seconds)
+
+def test_job_coalescing():
+    jobs = JobManager(max_workers=1, max_queued=1)
+    stored = []
+    first, coalesced = jobs.submit("a", 1, sleep_job, 0.5, on_success=lambda job, user, result: stored.append(user))
+    assert not coalesced
+    same, coalesced = jobs.submit("a", 2, sleep_job, 0.5)
+    assert coalesced and same["id"] == first["id"], "Identical jobs should share one run"
+    jobs.submit("b", 1, sleep_job, 0.5)
+    try:
+        jobs.submit("c", 1, sleep_job, 0.5)
+        assert False, "Queue should be full"
+    except QueueFullError:
+        pass
+
+    first["future"].result()
+    time.sleep(0.1)
+    assert first["state"] == "succeeded" and sorted(stored) == [1, 2], "Each subscriber should get the result"
+    jobs.shutdown()
+    print("Test passed: Identical training jobs are coalesced. ✅")
+
+def test_sweep(ticker="AHPC"):
+    configs = expand_space({"learning_rate": [0.0014, 0.005], "window_size": [4, 6], "epochs": [3]})
+    assert len(configs) == 4 and len(expand_space({"window_size": [4, 6, 8]}, "random", trials=2)) == 2
+    assert checkpoints(15) == [1, 3, 9]
+    # Sampled from a space far too large to build
+    huge = {"window_size": list(range(1, 1001)), "epochs": list(range(1, 1001))}
+    assert len(expand_space(huge, "random", trials=5, max_trials=10)) == 5
+    for space, mode in ((huge, "grid"), ({"window_size": [0.5]}, "grid"), ({"epochs": [0]}, "grid"),
+                        ({"learning_rate": [0.0]}, "grid"), ({"batch_size": [4]}, "random")):
+        try:
+            expand_space(space, mode, trials=0 if mode == "random" else 20, max_trials=10)
+        except ValueError:
+            continue
+        raise AssertionError(f"{space} should be rejected")
+
+    trials = run_sweep(ticker, configs, workers=2, eta=2)
+    statuses = sorted(t["status"] for t in trials)
+    assert statuses == ["completed", "pruned", "pruned", "pruned"], f"Unexpected trial statuses {statuses}"
+    for trial in trials:
+        assert len(trial["losses"]) == trial["epochs_run"] and trial["metrics"]["MSE"] > 0
+        assert (trial["epochs_run"] == 3) == (trial["status"] == "completed"), "Pruned trials should stop early"
+    print("Test passed: Sweeps prune losing trials and score every trial. ✅")
+
+def test_instrumentation():
+    histogram = Histogram("test_seconds", "Test", ("endpoint",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.observe(value, "/a")
+    lines = histogram.render()
+    assert 'test_seconds_bucket{endpoint="/a",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{endpoint="/a",le="+Inf"} 3' in lines and 'test_seconds_count{endpoint="/a"} 3' in lines
+
+    with span("outside"):
+        pass  # No request, nothing to record
+
+    async def app(scope, receive, send):
+        for _ in range(2):
+            with span("forward"):
+                time.sleep(0.01)
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sent = []
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(TimingMiddleware(app)({"type": "http", "method": "GET"}, None, send))
+    header = dict(sent[0]["headers"])[b"server-timing"].decode()
+    phases = dict(entry.split(";dur=") for entry in header.split(", "))
+    assert list(phases) == ["forward", "total"], f"Repeated phases should be summed, got {header}"
+    assert float(phases["total"]) >= float(phases["forward"]) >= 20
+    assert 'stocksense_request_duration_seconds_count{endpoint="unmatched",method="GET"} 1' in REQUEST_SECONDS.render()
+    print("Test passed: Spans are summed into Server-Timing and recorded in the histograms. ✅")
+
+_scratch_db = None
+
+def app_module():
+    """main bound to a scratch database, main binds its engine at import"""
+    global _scratch_db
+    if _scratch_db is None:
+        _scratch_db = tempfile.TemporaryDirectory()
+        os.environ["DATABASE_URL"] = f"sqlite:///{_scratch_db.name}/test.db"
+    import main
+    return main
+
+def test_price_history(ticker="AHPC"):
+    x = np.arange(1000, dtype=float)
+    y = np.sin(x / 50)
+    y[537] = 10  # A spike both methods have to keep
+    for kept in (lttb(x, y, 100), minmax(y, 100)):
+        assert len(kept) <= 100 and np.all(np.diff(kept) > 0) and 537 in kept
+    assert lttb(x, y, 100)[0] == 0 and lttb(x, y, 100)[-1] == 999, "LTTB should keep the first and last point"
+
+    df = get_stock_data(ticker)
+    days, values, source_points = price_series(df, ["close", "volume"], points=200)
+    assert len(days) == 200 and source_points == df['close'].notna().sum() and np.all(np.diff(days) >= 0)
+
+    buf = to_binary({ticker: (days, values, source_points)}, ["close", "volume"])
+    size = struct.unpack("<I", buf[:4])[0]
+    header = json.loads(buf[4:4 + size])
+    offset = 4 + size
+    assert offset % 4 == 0 and header["series"][0]["points"] == 200
+    assert np.array_equal(np.frombuffer(buf, "<i4", 200, offset), days)
+    assert np.array_equal(np.frombuffer(buf, "<f4", 200, offset + 800), values["close"])
+    assert len(buf) == offset + 3 * 4 * 200
+
+    body, encoding = compress(buf, "gzip, deflate")
+    assert encoding in ("gzip", None) and (encoding is None or gzip.decompress(body) == buf)
+
+    from fastapi.testclient import TestClient
+
+    main = app_module()
+    with TestClient(main.app) as client:
+        # Sectors in any case, with the ETag revalidating to a 304
+        response = client.get("/price_history", params={"sector": "hydropower", "points": 100})
+        series = response.json()["series"]
+        assert response.status_code == 200 and ticker in [s["ticker"] for s in series]
+        assert all(s["points"] <= 100 and len(s["dates"]) == len(s["close"]) == s["points"] for s in series)
+        revalidated = client.get("/price_history", params={"sector": "hydropower", "points": 100},
+                                 headers={"If-None-Match": response.headers["ETag"]})
+        assert revalidated.status_code == 304
+
+        response = client.get("/price_history", params={"tickers": ticker, "format": "binary", "points": 200,
+                                                        "fields": "close,volume"}, headers={"Accept-Encoding": "gzip"})
+        assert response.headers["Content-Encoding"] == "gzip" and response.content == buf, "Binary response differs"
+        for params in ({}, {"sector": "nope"}, {"tickers": ticker, "fields": "nope"}, {"tickers": ticker, "points": 2}):
+            assert client.get("/price_history", params=params).status_code in (400, 404, 422), f"{params} was accepted"
+    print("Test passed: Price history is downsampled and encoded as aligned float32 arrays. ✅")
+
+def test_prediction_history():
+    from datetime import datetime
+    from fastapi.testclient import TestClient
+
+    main = app_module()
+    db = main.SessionLocal()
+    user = main.User(username="history", hashed_password="-")
+    db.add(user)
+    db.commit()
+    same_time = datetime(2024, 3, 1, 12, 0)
+
+    def result(ticker, learning_rate, mse, created_at=None, prediction_at=None):
+        return main.PredictionResult(
+            ticker=ticker, batch_size=15, learning_rate=learning_rate, epochs=15, window_size=6,
+            mse=mse, rmse=1.0, mape=1.0, user_id=user.id, created_at=created_at,
+            prediction_at=prediction_at or (created_at.strftime("%Y-%m-%d %H:%M") if created_at else None),
+        )
+
+    db.add_all([result("AHPC", 0.001, float(k), created_at=same_time) for k in range(5)] + [
+        result("API", 0.01, 9.0, created_at=datetime(2024, 3, 2)),
+        # Legacy rows: one the backfill can parse, one it can't
+        result("API", 0.01, 1.0, prediction_at="2024-02-01 09:30"),
+        result("API", 0.01, 1.0, prediction_at="1 Feb 2024"),
+    ])
+    db.commit()
+    main.backfill_created_at()
+    legacy = db.query(main.PredictionResult).filter(main.PredictionResult.prediction_at == "2024-02-01 09:30").one()
+    assert legacy.created_at == datetime(2024, 2, 1, 9, 30), f"Backfilled created_at is {legacy.created_at}"
+
+    row = db.query(main.PredictionResult).first()
+    assert main.decode_cursor(main.encode_cursor(row)) == (row.created_at, row.id)
+    db.close()
+
+    token = main.create_access_token({"sub": "history"}, main.timedelta(hours=1))
+    headers = {"Authorization": f"Bearer {token}"}
+    with TestClient(main.app) as client:
+        # Pages of 2 over rows sharing created_at still visit every row once, newest first
+        ids, params = [], {"limit": 2}
+        while True:
+            page = client.get("/previous_predictions", params=params, headers=headers)
+            ids += [r["id"] for r in page.json()]
+            if "X-Next-Cursor" not in page.headers:
+                break
+            params["cursor"] = page.headers["X-Next-Cursor"]
+        assert len(ids) == len(set(ids)) == 7, f"Paging returned {ids}"
+        assert client.get("/previous_predictions", params={"cursor": "not a cursor"}, headers=headers).status_code == 400
+
+        filtered = client.get("/previous_predictions", params={"ticker": "AHPC", "max_learning_rate": 0.005}, headers=headers).json()
+        assert len(filtered) == 5 and all(r["ticker"] == "AHPC" for r in filtered)
+        ranged = client.get("/previous_predictions", params={"start": "2024-03-02T00:00:00"}, headers=headers).json()
+        assert [r["ticker"] for r in ranged] == ["API"]
+
+        # The summary counts exactly the rows the pages return
+        summary = client.get("/previous_predictions/summary", headers=headers).json()
+        assert summary["runs"] == len(ids), f"Summary counts {summary['runs']} runs, pages return {len(ids)}"
+        ahpc = next(t for t in summary["tickers"] if t["ticker"] == "AHPC")
+        assert ahpc["runs"] == 5 and ahpc["best"]["MSE"] == 0.0 and ahpc["mean"]["MSE"] == 2.0
+    print("Test passed: Prediction history pages, filters and summarizes the same rows. ✅")
+
 if __name__ == "__main__":
     test_train_test_split()
     test_get_stock_data()
+    test_price_store()
+    test_forward_batch()
+    test_bptt_gradients()
+    test_legacy_model_conversion()
+    test_model_artifact_roundtrip()
+    test_model_registry()
+    test_training_progress()
+    test_incremental_update()
+    test_sector_merge()
+    test_ticker_manifest()
+    test_eda_pipeline()
+    test_stacked_forecast()
+    test_bulk_evaluation()
+    test_float32_model()
+    test_early_stopping()
+    test_result_cache_disk_tier()
+    test_result_cache_concurrent_puts()
+    test_batch_writer()
+    test_job_coalescing()
+    test_instrumentation()
+    test_price_history()
+    test_prediction_history()
+    test_sweep()
     test_mape(actual, prediction)
     test_mse(actual, prediction)
     test_rmse(actual, prediction)
\ No newline at end of file
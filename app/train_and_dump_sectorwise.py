@@ -1,39 +1,28 @@
-import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MinMaxScaler
-from models.lstm import LSTM
-from models.stock import get_stock_data
-from models.utils import mse, rmse, mape
+import argparse
+import glob
 import os
-import joblib
+from models.bulk_train import print_summary, run_bulk_training
+from models.sector_merge import PREFIX, merged_path, read_sector_prices
 
 save_dir = "SavedModel"
-os.makedirs(save_dir, exist_ok=True)
 
-scaler = MinMaxScaler(feature_range=(-1, 1))
-
-model = LSTM(input_size=1, hidden_size=30, output_size=1, learning_rate=0.0014)
-df = pd.read_csv("./merged_sectorwise_data/merged_sector_data_latest_life insurance.csv")
-
-prices = df['close'].values.reshape(-1, 1)
-
-# Normalize
-scaled = scaler.fit_transform(prices)
-
-# Create sequences
-X, y = [], []
-window = 6
-for i in range(window, len(scaled)):
-    X.append(scaled[i-window:i])
-    y.append(scaled[i])
-
-X, y = np.array(X), np.array(y)
-split = int(0.8 * len(X))
-X_train, y_train = X[:split], y[:split]
-X_test, y_test = X[split:], y[split:]
-
-# Train model
-model.train(X_train, y_train, epochs=20 , batch_size=15)
-
-joblib.dump(model, os.path.join(save_dir, "life insurance.pkl"))
-print("Model saved successfully!")
\ No newline at end of file
+parser = argparse.ArgumentParser(description="Train one LSTM per sector in merged_sectorwise_data")
+parser.add_argument("sectors", nargs="*", help="Sectors to train, all of them by default")
+parser.add_argument("--workers", type=int, default=None, help="Worker processes, defaults to the number of cores")
+parser.add_argument("--force", action="store_true", help="Retrain models that are already up to date with their data")
+parser.add_argument("--epochs", type=int, default=20)
+parser.add_argument("--incremental", action="store_true", help="Fine-tune saved models on their new rows instead of retraining from scratch")
+parser.add_argument("--fine-tune-epochs", type=int, default=3)
+parser.add_argument("--dtype", choices=["float64", "float32"], default="float64", help="Precision of the weights and training arrays")
+args = parser.parse_args()
+
+sectors = args.sectors or sorted(
+    os.path.splitext(os.path.basename(path))[0][len(PREFIX):]
+    for path in glob.glob(merged_path("*"))
+)
+
+datasets = {sector: read_sector_prices(sector) for sector in sectors}
+
+summary = run_bulk_training(datasets, save_dir, workers=args.workers, force=args.force, epochs=args.epochs, batch_size=15,
+                            incremental=args.incremental, fine_tune_epochs=args.fine_tune_epochs, dtype=args.dtype)
+print_summary(summary)
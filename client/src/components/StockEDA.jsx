@@ -110,13 +110,13 @@ function StockEDA({ ticker }) {
     setTabIndex(newValue);
   };
 
-  // Function to render plots from base64 data
-  const renderPlot = (plotData) => {
-    if (!plotData) return null;
+  // Plots are separate images the browser caches, the EDA document only has their paths
+  const renderPlot = (plotPath) => {
+    if (!plotPath) return null;
     return (
       <Box sx={{ display: 'flex', justifyContent: 'center', width: '100%', height: '100%' }}>
         <img 
-          src={`data:image/png;base64,${plotData}`} 
+          src={`http://localhost:8000${plotPath}`} 
           alt="Statistical plot"
           style={{ maxWidth: '100%', maxHeight: '250px', objectFit: 'contain' }}
         />
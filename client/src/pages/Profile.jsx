@@ -28,6 +28,9 @@ import * as jwtDecode from "jwt-decode"; // Fixed import
 export default function Profile() {
   const [username, setUsername] = useState("");
   const [predictions, setPredictions] = useState([]);
+  const [totalPredictions, setTotalPredictions] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
   const [notification, setNotification] = useState({ open: false, message: "", severity: "success" });
   const [redirectToLogin, setRedirectToLogin] = useState(false);
@@ -64,11 +67,18 @@ export default function Profile() {
 
         setUsername(userInfo.username);
 
-        // Fetch prediction history
-        const predictionResponse = await axios.get("http://localhost:8000/previous_predictions", {
-          headers: { Authorization: `Bearer ${token}` }
-        });
+        // Fetch the first page of the prediction history and the per-ticker totals
+        const [predictionResponse, summaryResponse] = await Promise.all([
+          axios.get("http://localhost:8000/previous_predictions", {
+            headers: { Authorization: `Bearer ${token}` }
+          }),
+          axios.get("http://localhost:8000/previous_predictions/summary", {
+            headers: { Authorization: `Bearer ${token}` }
+          })
+        ]);
         setPredictions(predictionResponse.data);
+        setNextCursor(predictionResponse.headers["x-next-cursor"] || null);
+        setTotalPredictions(summaryResponse.data.runs);
 
         setLoading(false);
       } catch (error) {
@@ -85,6 +95,26 @@ export default function Profile() {
     fetchUserInfoAndPredictions();
   }, []);
 
+  const loadMorePredictions = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get("http://localhost:8000/previous_predictions", {
+        headers: { Authorization: `Bearer ${localStorage.getItem("token")}` },
+        params: { cursor: nextCursor }
+      });
+      setPredictions((previous) => [...previous, ...response.data]);
+      setNextCursor(response.headers["x-next-cursor"] || null);
+    } catch (error) {
+      console.error("Failed to load more predictions:", error);
+      setNotification({
+        open: true,
+        message: "Failed to load more predictions.",
+        severity: "error"
+      });
+    }
+    setLoadingMore(false);
+  };
+
   const handleLogout = () => {
     setNotification({
       open: true,
@@ -173,7 +203,7 @@ export default function Profile() {
             </Typography>
 
             <Typography variant="body1" className="text-lg">
-                  Predictions Made: <span className="font-medium">{predictions.length}</span>
+                  Predictions Made: <span className="font-medium">{totalPredictions}</span>
             </Typography>
 
           </CardContent>
@@ -227,6 +257,14 @@ export default function Profile() {
             </TableContainer>
           )}
 
+          {nextCursor && (
+            <Box className="mt-6 text-center" style={{marginTop:"20px"}}>
+              <Button variant="outlined" onClick={loadMorePredictions} disabled={loadingMore}>
+                {loadingMore ? "Loading..." : "Load more"}
+              </Button>
+            </Box>
+          )}
+
           <Box className="mt-6 text-center">
             <Typography variant="body1" className="text-gray-600 italic" style={{marginTop:"20px"}}>
               Your recent prediction history is displayed above.